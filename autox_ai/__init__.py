@@ -0,0 +1 @@
+# autox_ai package initialization
@@ -0,0 +1,31 @@
+# _hotpath.py - Numba-compiled account selection for EnhancedAPIManager
+
+import numpy as np
+from numba import njit
+
+@njit(cache=True)
+def pick_best(health, last_used_ts, rate_until_ts, bl_until_ts, now_ts, min_health):
+    """Scan the account columns once and return the candidate for each switch_account strategy.
+
+    Times are Unix seconds with -inf for unset. Returns (healthiest available
+    account if above min_health, least recently used available account,
+    account with the earliest expiry), each -1 when there is no candidate.
+    """
+    best_h, best_i = -1.0, -1
+    lru_t, lru_i = np.inf, -1
+    exp_t, exp_i = np.inf, -1
+    for i in range(health.shape[0]):
+        if rate_until_ts[i] <= now_ts and bl_until_ts[i] <= now_ts:
+            if health[i] > best_h:
+                best_h, best_i = health[i], i
+            if last_used_ts[i] < lru_t:
+                lru_t, lru_i = last_used_ts[i], i
+        else:
+            e = np.inf
+            if np.isfinite(rate_until_ts[i]):
+                e = rate_until_ts[i]
+            if np.isfinite(bl_until_ts[i]) and bl_until_ts[i] < e:
+                e = bl_until_ts[i]
+            if e < exp_t:
+                exp_t, exp_i = e, i
+    return (best_i if best_h > min_health else -1), lru_i, exp_i
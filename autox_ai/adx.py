@@ -1,108 +1,62 @@
 # adx.py - Adaptive Execution System for ZealX
 
-import time
-import threading
-from datetime import datetime, timedelta
 import os
-import json
-import sys
-sys.path.append(os.path.abspath("/Users/momo/Desktop/x"))
+import time
 
-from autox_ai.logger import log_error
+try:
+    import psutil
+except ImportError:
+    # psutil not available, system load checks are skipped
+    psutil = None
 
-# Constants
-IDLE_TIMEOUT = 300  # 5 minutes of inactivity before sleep mode
-MONITORING_INTERVAL = 60  # Check system state every 60 seconds
-MIN_MONITORING_INTERVAL = 5  # Minimum interval (seconds) for high activity
-MAX_MONITORING_INTERVAL = 300  # Maximum interval (seconds) for low activity
-ACTIVITY_THRESHOLD = 3  # Number of events to consider "active"
-STATS_FILE = "adx_stats.json"
+from autox_ai.adx_base import (
+    _ADXBase,
+    IDLE_TIMEOUT,
+    MONITORING_INTERVAL,
+    MIN_MONITORING_INTERVAL,
+    MAX_MONITORING_INTERVAL,
+    ACTIVITY_THRESHOLD,
+)
 
-class ADX:
+class ADX(_ADXBase):
     """Adaptive Execution System that optimizes ZealX's performance by dynamically controlling resource usage."""
     
+    __slots__ = (
+        "_has_pending_tasks", "_has_active_listeners", "_has_upcoming_tasks",
+        "_has_active_user_session", "_has_active_processes",
+    )
+    
     def __init__(self, autox_instance):
         """Initialize ADX with an AutoX instance.
         
         Args:
             autox_instance: The AutoX instance to control
         """
-        self.autox = autox_instance
-        self.last_activity = datetime.now()
-        self.is_sleeping = False
-        self.monitoring_interval = MONITORING_INTERVAL
-        self.running = False
-        self.event_count = 0
-        self.last_event_time = datetime.now()
-        self.stats = {
-            "sleep_count": 0,
-            "wake_count": 0,
-            "total_sleep_time": 0,
-            "avg_monitoring_interval": MONITORING_INTERVAL,
-            "last_updated": datetime.now().isoformat()
-        }
+        super().__init__(autox_instance)
+        self._bind_autox_capabilities()
         
-        # Load previous stats if available
-        self.load_stats()
-    
-    def load_stats(self):
-        """Load ADX statistics from storage."""
-        stats_path = os.path.join("storagex_data", STATS_FILE)
-        if os.path.exists(stats_path):
-            try:
-                with open(stats_path, 'r') as f:
-                    self.stats = json.load(f)
-            except Exception as e:
-                log_error(f"Failed to load ADX stats: {str(e)}")
-    
-    def save_stats(self):
-        """Save ADX statistics to storage."""
-        stats_path = os.path.join("storagex_data", STATS_FILE)
-        self.stats["last_updated"] = datetime.now().isoformat()
+        # Prime the CPU counters so later non-blocking samples return a real delta
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)
+    
+    def _bind_autox_capabilities(self):
+        """Resolve the optional AutoX status hooks once instead of probing them every tick."""
+        self._has_pending_tasks = getattr(self.autox, 'has_pending_tasks', None)
+        self._has_active_listeners = getattr(self.autox, 'has_active_listeners', None)
+        self._has_upcoming_tasks = getattr(self.autox, 'has_upcoming_tasks', None)
+        self._has_active_user_session = getattr(self.autox, 'has_active_user_session', None)
         
-        try:
-            with open(stats_path, 'w') as f:
-                json.dump(self.stats, f, indent=2)
-        except Exception as e:
-            log_error(f"Failed to save ADX stats: {str(e)}")
-    
-    def record_activity(self):
-        """Record user activity to prevent sleep mode."""
-        self.last_activity = datetime.now()
-        self.event_count += 1
-        self.last_event_time = datetime.now()
-        
-        # Wake up if sleeping
-        if self.is_sleeping:
-            self.wake()
-    
-    def sleep(self):
-        """Put AutoX into sleep mode to save resources."""
-        if not self.is_sleeping and self.autox.running:
-            print(f"ADX: Putting AutoX into sleep mode due to inactivity ({IDLE_TIMEOUT} seconds)")
-            self.autox.stop()
-            self.is_sleeping = True
-            self.stats["sleep_count"] += 1
-            self.sleep_start_time = datetime.now()
-            self.save_stats()
-    
-    def wake(self):
-        """Wake AutoX from sleep mode."""
-        if self.is_sleeping:
-            print("ADX: Waking AutoX from sleep mode due to new activity")
-            self.autox.start()
-            self.is_sleeping = False
-            self.stats["wake_count"] += 1
-            
-            # Calculate sleep duration
-            sleep_duration = (datetime.now() - self.sleep_start_time).total_seconds()
-            self.stats["total_sleep_time"] += sleep_duration
-            self.save_stats()
+        # Without any optional hooks only recent events and CPU load can keep AutoX awake
+        if (self._has_pending_tasks is None and self._has_active_listeners is None
+                and self._has_upcoming_tasks is None and self._has_active_user_session is None):
+            self._has_active_processes = self._has_recent_activity_or_load
+        else:
+            self._has_active_processes = self.has_active_processes
     
     def adjust_monitoring_interval(self):
         """Dynamically adjust monitoring interval based on activity level."""
         # Calculate time since last event
-        time_since_last_event = (datetime.now() - self.last_event_time).total_seconds()
+        time_since_last_event = self._now() - self.last_event_time
         
         # If recent activity, decrease interval for more responsive monitoring
         if self.event_count >= ACTIVITY_THRESHOLD or time_since_last_event < 60:
@@ -115,7 +69,7 @@ class ADX:
                                           self.monitoring_interval * 1.2)
         
         # Update stats
-        self.stats["avg_monitoring_interval"] = self.monitoring_interval
+        self._avg_interval = self.monitoring_interval
         
         # Reset event counter every adjustment
         self.event_count = 0
@@ -127,89 +81,70 @@ class ADX:
         Enhanced with better context awareness to prevent incorrect pausing.
         """
         # Check if there were any events in the last 2 minutes (increased from 1 minute)
-        time_since_last_event = (datetime.now() - self.last_event_time).total_seconds()
+        time_since_last_event = self._now() - self.last_event_time
         if time_since_last_event < 120:  # Increased from 60 seconds to 120 seconds
             return True
             
         # Check if there are pending tasks in AutoX
-        if hasattr(self.autox, 'has_pending_tasks') and self.autox.has_pending_tasks():
+        if self._has_pending_tasks is not None and self._has_pending_tasks():
             return True
             
         # Check if there are active listeners or triggers
-        if hasattr(self.autox, 'has_active_listeners') and self.autox.has_active_listeners():
+        if self._has_active_listeners is not None and self._has_active_listeners():
             return True
         
         # Check for scheduled tasks that will run soon
-        if hasattr(self.autox, 'has_upcoming_tasks'):
+        if self._has_upcoming_tasks is not None:
             # If there are tasks scheduled to run in the next 5 minutes, don't sleep
-            if self.autox.has_upcoming_tasks(minutes=5):
+            if self._has_upcoming_tasks(minutes=5):
                 return True
         
         # Check for active user sessions
-        if hasattr(self.autox, 'has_active_user_session') and self.autox.has_active_user_session():
+        if self._has_active_user_session is not None and self._has_active_user_session():
             return True
         
         # Check system load - don't sleep during high CPU/memory activity
         # as it might be processing something important
-        try:
-            import psutil
-            cpu_percent = psutil.cpu_percent(interval=0.5)
+        if psutil is not None:
+            # Non-blocking: usage since the previous call instead of sleeping to measure
+            cpu_percent = psutil.cpu_percent(interval=None)
             if cpu_percent > 30:  # If CPU usage is above 30%, consider system active
                 return True
-        except ImportError:
-            # psutil not available, skip this check
-            pass
             
         return False
     
-    def monitor(self):
-        """Monitor system state and control AutoX execution."""
-        while self.running:
-            # Check if system has been idle
-            idle_time = (datetime.now() - self.last_activity).total_seconds()
-            
-            # Only sleep if system is idle AND there are no active processes
-            if idle_time > IDLE_TIMEOUT and not self.is_sleeping and not self.has_active_processes():
-                self.sleep()
-            elif (idle_time <= IDLE_TIMEOUT or self.has_active_processes()) and self.is_sleeping:
-                self.wake()
-            
-            # Adjust monitoring interval based on activity
-            self.adjust_monitoring_interval()
-            
-            # Sleep for the current monitoring interval
-            time.sleep(self.monitoring_interval)
+    def _has_recent_activity_or_load(self):
+        """has_active_processes() specialized for AutoX instances without optional status hooks."""
+        if self._now() - self.last_event_time < 120:
+            return True
+        return psutil is not None and psutil.cpu_percent(interval=None) > 30
+    
+    def _monitor_tick(self):
+        """Sleep or wake AutoX based on idle time and active work."""
+        # Check if system has been idle
+        idle_time = self._now() - self._last_activity
+        
+        # Only sleep if system is idle AND there are no active processes
+        if idle_time > IDLE_TIMEOUT and not self.is_sleeping and not self._has_active_processes():
+            self.sleep()
+        elif (idle_time <= IDLE_TIMEOUT or self._has_active_processes()) and self.is_sleeping:
+            self.wake()
+        
+        # Adjust monitoring interval based on activity
+        self.adjust_monitoring_interval()
+        
+        return self.monitoring_interval
     
     def start(self):
         """Start the ADX monitoring system."""
         if not self.running:
-            self.running = True
-            self.last_activity = datetime.now()
-            
-            # Start monitoring thread
-            self.monitor_thread = threading.Thread(target=self.monitor)
-            self.monitor_thread.daemon = True
-            self.monitor_thread.start()
-            
-            print("ADX: Adaptive Execution System started")
+            self._last_activity = time.monotonic()
+        super().start()
     
-    def stop(self):
-        """Stop the ADX monitoring system."""
-        if self.running:
-            self.running = False
-            
-            # Wait for monitoring thread to finish
-            if hasattr(self, 'monitor_thread') and self.monitor_thread.is_alive():
-                self.monitor_thread.join(timeout=1.0)
-            
-            # Wake AutoX if it's sleeping
-            if self.is_sleeping:
-                self.wake()
-            
-            # Save final stats
-            self.save_stats()
-            
-            print("ADX: Adaptive Execution System stopped")
+    def _on_stop(self):
+        """Wake AutoX if it's sleeping."""
+        if self.is_sleeping:
+            self.wake()
 
 # Example usage
 if __name__ == "__main__":
@@ -242,9 +177,10 @@ if __name__ == "__main__":
         adx.record_activity()
         time.sleep(1)
     
-    # Wait for idle timeout
-    print(f"Waiting for idle timeout ({IDLE_TIMEOUT} seconds)...")
-    time.sleep(IDLE_TIMEOUT + 5)
+    # Wait for idle timeout (opt-in, since it takes over five minutes)
+    if os.environ.get("ADX_DEMO_WAIT_IDLE"):
+        print(f"Waiting for idle timeout ({IDLE_TIMEOUT} seconds)...")
+        time.sleep(IDLE_TIMEOUT + 5)
     
     # Simulate new activity to wake up
     print("Simulating new activity...")
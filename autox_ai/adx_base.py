@@ -0,0 +1,326 @@
+# adx_base.py - Shared core of the Adaptive Execution Systems for ZealX
+
+import time
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import os
+import json
+import mmap
+import struct
+
+from autox_ai.logger import log_error
+
+@dataclass(frozen=True)
+class Config:
+    """Tuning constants shared by every ADX variant."""
+    idle_timeout: int = 300  # 5 minutes of inactivity before sleep mode
+    monitoring_interval: int = 60  # Check system state every 60 seconds
+    min_monitoring_interval: int = 5  # Minimum interval (seconds) for high activity
+    max_monitoring_interval: int = 300  # Maximum interval (seconds) for low activity
+    activity_threshold: int = 3  # Number of events to consider "active"
+    stats_file: str = "adx_stats.bin"
+    legacy_stats_file: str = "adx_stats.json"  # JSON stats written by older versions
+    stats_flush_interval: int = 60  # Minimum seconds between periodic stats writes
+    battery_threshold: int = 20  # Battery percentage threshold for power saving mode
+    cpu_threshold: int = 80  # CPU usage threshold for throttling
+    memory_threshold: int = 80  # Memory usage threshold for optimization
+    resource_cache_ttl: int = 10  # Maximum seconds to reuse a resource sample
+
+CONFIG = Config()
+
+# Constants
+IDLE_TIMEOUT = CONFIG.idle_timeout
+MONITORING_INTERVAL = CONFIG.monitoring_interval
+MIN_MONITORING_INTERVAL = CONFIG.min_monitoring_interval
+MAX_MONITORING_INTERVAL = CONFIG.max_monitoring_interval
+ACTIVITY_THRESHOLD = CONFIG.activity_threshold
+STATS_FILE = CONFIG.stats_file
+LEGACY_STATS_FILE = CONFIG.legacy_stats_file
+STATS_FLUSH_INTERVAL = CONFIG.stats_flush_interval
+BATTERY_THRESHOLD = CONFIG.battery_threshold
+CPU_THRESHOLD = CONFIG.cpu_threshold
+MEMORY_THRESHOLD = CONFIG.memory_threshold
+RESOURCE_CACHE_TTL = CONFIG.resource_cache_ttl
+
+# Fixed 64-byte on-disk stats record: magic, sleep count, wake count, total sleep
+# seconds, average interval in milliseconds, power saving and throttling
+# activations, and the last update as a Unix timestamp
+STATS_RECORD = struct.Struct("<8sqqdqqqd")
+STATS_MAGIC = b"ADXSTAT1"
+
+class _ADXBase:
+    """Sleep/wake control, activity tracking and stats persistence shared by ADX variants.
+    
+    Subclasses supply the per-tick policy through _monitor_tick() and may
+    extend the stats property and _on_stop().
+    """
+    
+    __slots__ = (
+        "autox", "_now_cache", "_last_activity", "is_sleeping", "monitoring_interval",
+        "running", "_stop_event", "_interrupt", "monitor_thread", "event_count",
+        "last_event_time", "sleep_start_time", "_stats_dirty", "_last_stats_flush",
+        "_stats_path", "_stats_mm", "_sleep_count", "_wake_count", "_total_sleep_time",
+        "_avg_interval", "_power_saving_activations", "_throttling_activations",
+        "_last_updated",
+    )
+    
+    _display_name = "Adaptive Execution System"
+    
+    def __init__(self, autox_instance):
+        """Initialize ADX with an AutoX instance.
+        
+        Args:
+            autox_instance: The AutoX instance to control
+        """
+        self.autox = autox_instance
+        self._now_cache = None
+        self._last_activity = time.monotonic()
+        self.is_sleeping = False
+        self.monitoring_interval = MONITORING_INTERVAL
+        self.running = False
+        self._stop_event = threading.Event()
+        self._interrupt = False
+        self.monitor_thread = None
+        self.event_count = 0
+        self.last_event_time = time.monotonic()
+        self.sleep_start_time = None
+        self._stats_dirty = False
+        self._last_stats_flush = time.monotonic()
+        self._stats_path = os.path.join("storagex_data", STATS_FILE)
+        self._stats_mm = None
+        
+        # Stats counters are plain attributes; the stats property snapshots them
+        self._sleep_count = 0
+        self._wake_count = 0
+        self._total_sleep_time = 0
+        self._avg_interval = MONITORING_INTERVAL
+        self._power_saving_activations = 0
+        self._throttling_activations = 0
+        self._last_updated = datetime.now().isoformat()
+        
+        # Load previous stats if available
+        self._open_stats_segment()
+        self.load_stats()
+    
+    @property
+    def stats(self):
+        """Snapshot of the ADX statistics."""
+        return {
+            "sleep_count": self._sleep_count,
+            "wake_count": self._wake_count,
+            "total_sleep_time": self._total_sleep_time,
+            "avg_monitoring_interval": self._avg_interval,
+            "last_updated": self._last_updated
+        }
+    
+    def _restore_stats(self, stats):
+        """Restore the stats counters from a previously saved mapping."""
+        self._sleep_count = stats.get("sleep_count", self._sleep_count)
+        self._wake_count = stats.get("wake_count", self._wake_count)
+        self._total_sleep_time = stats.get("total_sleep_time", self._total_sleep_time)
+        self._avg_interval = stats.get("avg_monitoring_interval", self._avg_interval)
+        self._power_saving_activations = stats.get("power_saving_activations", self._power_saving_activations)
+        self._throttling_activations = stats.get("throttling_activations", self._throttling_activations)
+        self._last_updated = stats.get("last_updated", self._last_updated)
+    
+    def _now(self):
+        """Return the current monotonic time, reusing the value cached for this monitor tick."""
+        if self._now_cache is not None:
+            return self._now_cache
+        return time.monotonic()
+    
+    @property
+    def last_activity(self):
+        """Wall-clock time of the last recorded activity."""
+        return datetime.now() - timedelta(seconds=time.monotonic() - self._last_activity)
+    
+    def _open_stats_segment(self):
+        """Map the fixed-size stats record into memory, creating the file if needed."""
+        try:
+            fd = os.open(self._stats_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < STATS_RECORD.size:
+                    os.ftruncate(fd, STATS_RECORD.size)
+                self._stats_mm = mmap.mmap(fd, STATS_RECORD.size)
+            finally:
+                os.close(fd)
+        except (OSError, ValueError) as e:
+            log_error(f"Failed to map ADX stats: {str(e)}")
+    
+    def _close_stats_segment(self):
+        """Unmap the stats record, if mapped."""
+        if self._stats_mm is not None:
+            self._stats_mm.close()
+            self._stats_mm = None
+    
+    def _load_legacy_stats(self):
+        """Seed stats from the JSON file written by older versions, if present."""
+        legacy_path = os.path.join(os.path.dirname(self._stats_path), LEGACY_STATS_FILE)
+        if os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, 'r') as f:
+                    self._restore_stats(json.load(f))
+                self._stats_dirty = True
+            except Exception as e:
+                log_error(f"Failed to load ADX stats: {str(e)}")
+    
+    def load_stats(self):
+        """Load ADX statistics from storage."""
+        if self._stats_mm is None:
+            return
+        
+        (magic, sleep_count, wake_count, total_sleep_time, interval_ms,
+         power_saving_activations, throttling_activations, updated) = STATS_RECORD.unpack_from(self._stats_mm)
+        if magic != STATS_MAGIC:
+            self._load_legacy_stats()
+            return
+        
+        self._restore_stats({
+            "sleep_count": sleep_count,
+            "wake_count": wake_count,
+            "total_sleep_time": total_sleep_time,
+            "avg_monitoring_interval": interval_ms / 1000,
+            "power_saving_activations": power_saving_activations,
+            "throttling_activations": throttling_activations,
+            "last_updated": datetime.fromtimestamp(updated).isoformat()
+        })
+    
+    def save_stats(self):
+        """Save ADX statistics to storage.
+        
+        Fields are packed in place into the mapped record and synced with a
+        single flush, so there is no serialization or file reopen per save.
+        """
+        now = datetime.now()
+        self._last_updated = now.isoformat()
+        if self._stats_mm is None:
+            return
+        
+        try:
+            STATS_RECORD.pack_into(
+                self._stats_mm, 0, STATS_MAGIC,
+                int(self._sleep_count),
+                int(self._wake_count),
+                float(self._total_sleep_time),
+                int(round(self._avg_interval * 1000)),
+                int(self._power_saving_activations),
+                int(self._throttling_activations),
+                now.timestamp()
+            )
+            self._stats_mm.flush()
+            self._stats_dirty = False
+            self._last_stats_flush = time.monotonic()
+        except Exception as e:
+            log_error(f"Failed to save ADX stats: {str(e)}")
+    
+    def flush_stats(self):
+        """Write pending stats changes if the flush interval has elapsed."""
+        if self._stats_dirty and self._now() - self._last_stats_flush >= STATS_FLUSH_INTERVAL:
+            self.save_stats()
+    
+    def record_activity(self):
+        """Record user activity to prevent sleep mode."""
+        now = self._now()
+        burst_start = now - self.last_event_time >= MIN_MONITORING_INTERVAL
+        self._last_activity = now
+        self.event_count += 1
+        self.last_event_time = now
+        
+        # Wake up if sleeping
+        if self.is_sleeping:
+            self.wake()
+        
+        # Kick the monitor loop out of a long wait on the first event of a burst
+        if burst_start and self.running:
+            self._interrupt = True
+            self._stop_event.set()
+    
+    def sleep(self):
+        """Put AutoX into sleep mode to save resources."""
+        if not self.is_sleeping and self.autox.running:
+            print(f"ADX: Putting AutoX into sleep mode due to inactivity ({IDLE_TIMEOUT} seconds)")
+            self.autox.stop()
+            self.is_sleeping = True
+            self._sleep_count += 1
+            self.sleep_start_time = self._now()
+            self._stats_dirty = True
+    
+    def wake(self):
+        """Wake AutoX from sleep mode."""
+        if self.is_sleeping:
+            print("ADX: Waking AutoX from sleep mode due to new activity")
+            self.autox.start()
+            self.is_sleeping = False
+            self._wake_count += 1
+            
+            # Calculate sleep duration
+            sleep_duration = self._now() - self.sleep_start_time
+            self._total_sleep_time += sleep_duration
+            self._stats_dirty = True
+    
+    def _monitor_tick(self):
+        """Run one round of policy checks and return the seconds to wait before the next."""
+        return self.monitoring_interval
+    
+    def monitor(self):
+        """Monitor system state and control AutoX execution."""
+        while self.running:
+            try:
+                # Read the clock once per tick and share it with every check below
+                self._now_cache = time.monotonic()
+                
+                interval = self._monitor_tick()
+                
+                # Persist stats changed since the last periodic flush
+                self.flush_stats()
+            except Exception as e:
+                log_error(f"Error in ADX monitoring: {str(e)}")
+                interval = MONITORING_INTERVAL  # Default interval on error
+            finally:
+                # Drop the cached time so calls made between ticks read a fresh clock
+                self._now_cache = None
+            
+            # Sleep for the chosen interval, returning early on stop() or new activity
+            if self._stop_event.wait(interval):
+                if not self._interrupt:
+                    break
+                self._interrupt = False
+                self._stop_event.clear()
+    
+    def start(self):
+        """Start the ADX monitoring system."""
+        if not self.running:
+            self.running = True
+            self._interrupt = False
+            self._stop_event.clear()
+            if self._stats_mm is None:
+                self._open_stats_segment()
+            
+            # Start monitoring thread
+            self.monitor_thread = threading.Thread(target=self.monitor)
+            self.monitor_thread.daemon = True
+            self.monitor_thread.start()
+            
+            print(f"ADX: {self._display_name} started")
+    
+    def _on_stop(self):
+        """Hand AutoX back in a consistent state once monitoring has stopped."""
+    
+    def stop(self):
+        """Stop the ADX monitoring system."""
+        if self.running:
+            self.running = False
+            self._stop_event.set()
+            
+            # Wait for monitoring thread to finish
+            if self.monitor_thread is not None and self.monitor_thread.is_alive():
+                self.monitor_thread.join(timeout=1.0)
+            
+            self._on_stop()
+            
+            # Save final stats, then release the mapping; start() maps it again
+            self.save_stats()
+            self._close_stats_segment()
+            
+            print(f"ADX: {self._display_name} stopped")
@@ -1,164 +1,478 @@
 # api_manager.py - Manages API calls & rotates accounts on failure
 
+import array
+import asyncio
+import concurrent.futures
+from dataclasses import dataclass, field
+from collections import deque, OrderedDict
+from functools import lru_cache
+import hashlib
+import json
 import requests
-import random
+from requests.adapters import HTTPAdapter
+import secrets
+import threading
 import time
 import math
-from datetime import datetime, timedelta
+import statistics
+import numpy as np
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Mapping, Optional, Union
 from .config import AUTOX_AI_ACCOUNTS, API_BASE_URL, RETRY_LIMIT, RATE_LIMIT_COOLDOWN, REQUEST_TIMEOUT, BACKOFF_BASE
+from .config import (
+    AIMD_INITIAL_CONCURRENCY, AIMD_MAX_CONCURRENCY, AIMD_INCREASE_AFTER,
+    AIMD_LATENCY_WINDOW, AIMD_LATENCY_TARGET, RATE_LIMIT_REMAINING_THRESHOLD,
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_TIMEOUT, BREAKER_MAX_TIMEOUT,
+    LOG_SAMPLE_PER_MINUTE, ERROR_BODY_LOG_LIMIT, METRICS_RING_SIZE
+)
 from .logger import log_error, log_warning
 
+try:
+    import httpx
+except ImportError:
+    # httpx not available, only the synchronous run() can be used
+    httpx = None  # type: ignore[assignment]
+
+try:
+    import orjson
+except ImportError:
+    # orjson not available, fall back to the slower stdlib json
+    orjson = None  # type: ignore[assignment]
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+    _json_loads = json.loads
+
+@dataclass(slots=True)
+class AccountStatus:
+    """Health, rate-limit and concurrency bookkeeping for one API account."""
+    failures: int = 0
+    consecutive_failures: int = 0
+    # Timestamps are time.monotonic() seconds; 0.0 means never
+    rate_limited_until: float = 0.0
+    last_success: float = 0.0
+    total_requests: int = 0
+    total_failures: int = 0
+    health_score: int = 100  # 100 = perfect health, 0 = completely unreliable
+    cooldown_multiplier: float = 1.0  # Dynamic cooldown multiplier
+    last_used: float = 0.0  # Track when account was last used
+    
+    # Async concurrency cap, adjusted by additive-increase/multiplicative-decrease
+    concurrency: int = AIMD_INITIAL_CONCURRENCY
+    sem: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(AIMD_INITIAL_CONCURRENCY))
+    permit_debt: int = 0  # Permits still to be taken out of circulation after a decrease
+    aimd_successes: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=AIMD_LATENCY_WINDOW))
+    
+    # Circuit breaker: CLOSED -> OPEN on hard failures -> HALF_OPEN single probe -> CLOSED
+    circuit: str = "CLOSED"
+    circuit_opened_at: float = 0.0
+    circuit_timeout: float = float(BREAKER_TIMEOUT)
+    circuit_probing: bool = False
+    
+    # Token bucket that samples this account's log messages during failure storms
+    log_tokens: float = float(LOG_SAMPLE_PER_MINUTE)
+    log_refilled_at: float = field(default_factory=time.monotonic)
+    log_dropped: int = 0
+    
+    # Metrics: recent request latencies (seconds) in a fixed ring, plus outcome counters
+    latency_ring: array.array = field(default_factory=lambda: array.array("d", bytes(8 * METRICS_RING_SIZE)), repr=False)
+    latency_count: int = 0
+    rate_limit_hits: int = 0
+    retried_successes: int = 0
+    
+    # Per-account request constants, built once instead of on every retry
+    url_base: str = ""
+    headers: dict = field(default_factory=dict, repr=False)  # Holds the API key
+    api_key_prefix: str = "***"
+
+@dataclass(slots=True)
+class _Flight:
+    """An async request on the wire and the number of arun() callers awaiting it"""
+    task: asyncio.Task
+    waiters: int = 0
+
 class AutoXAIManager:
-    def __init__(self):
-        self.accounts = AUTOX_AI_ACCOUNTS
-        self.current_index = random.randint(0, len(self.accounts) - 1)  # Start from a random account
-        
-        # Track account status and rate limits
-        self.account_status = {}
-        for i, account in enumerate(self.accounts):
-            self.account_status[i] = {
-                "failures": 0,
-                "consecutive_failures": 0,
-                "rate_limited_until": None,
-                "last_success": None,
-                "total_requests": 0,
-                "total_failures": 0,
-                "health_score": 100,  # 100 = perfect health, 0 = completely unreliable
-                "cooldown_multiplier": 1.0,  # Dynamic cooldown multiplier
-                "last_used": None  # Track when account was last used
-            }
+    def __init__(self) -> None:
+        self.accounts: list[dict[str, str]] = AUTOX_AI_ACCOUNTS
+        if not self.accounts:
+            raise RuntimeError("No AUTOX_AI_ACCOUNTS configured")
+        self.current_index = secrets.randbelow(len(self.accounts))  # Start from a random account
+        
+        # Track account status and rate limits, indexed like self.accounts
+        self.account_status = [
+            AccountStatus(
+                url_base=API_BASE_URL.format(account["account_id"]),
+                headers={"Authorization": f"Bearer {account['api_key']}", "Content-Type": "application/json"},
+                # For security, only show first few chars of API key in logs
+                api_key_prefix=account["api_key"][:4] + "..." if len(account["api_key"]) > 4 else "***"
+            )
+            for account in self.accounts
+        ]
+        
+        # Column copies of the fields switch_account ranks by, so selection is one vectorized pass
+        self._health_scores = np.full(len(self.accounts), 100, dtype=np.int16)
+        self._last_used = np.full(len(self.accounts), -np.inf)  # Never used sorts first
+        self._rate_limited_until = np.zeros(len(self.accounts))
+        self._circuit_closed = np.ones(len(self.accounts), dtype=bool)
+        
+        # Pooled keep-alive session so retries and repeat calls reuse open connections
+        self.session = requests.Session()
+        pool_size = max(1, len(self.accounts))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size * 2, max_retries=0)
+        self.session.mount("https://", adapter)
+        
+        # Async HTTP/2 client is created lazily inside the event loop that first uses it
+        self._async_client: Optional[Any] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Event loop owned by this manager, run on its own thread so callers on any loop share
+        # one set of loop-bound state (in-flight futures, account semaphores, async client)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        
+        # Successful response bodies keyed by request hash, oldest first: key -> (stored_at, body).
+        # Shared by run() callers and the manager's loop thread, so every access holds _cache_lock
+        self._cache: OrderedDict[bytes, tuple[float, bytes]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Async requests currently on the wire, so identical callers share one call
+        self._inflight: dict[bytes, _Flight] = {}
     
-    def get_active_account(self):
+    def get_active_account(self) -> dict[str, str]:
         """Get the currently active account"""
         return self.accounts[self.current_index]
     
-    def get_account_status(self, index=None):
+    def get_account_status(self, index: Optional[int] = None) -> Union[AccountStatus, list[AccountStatus]]:
         """Get status for a specific account or all accounts"""
         if index is not None:
             return self.account_status[index]
         return self.account_status
     
-    def is_account_available(self, index):
-        """Check if an account is currently available (not rate limited)"""
+    def is_account_available(self, index: int) -> bool:
+        """Check if an account is currently available (not rate limited and circuit not open)"""
+        status = self.account_status[index]
+        if status.circuit != "CLOSED":
+            if status.circuit == "OPEN":
+                if time.monotonic() - status.circuit_opened_at < status.circuit_timeout:
+                    return False
+                
+                # Timeout elapsed, let a single probe request through
+                status.circuit = "HALF_OPEN"
+                status.circuit_probing = False
+            if status.circuit_probing:
+                return False
+        return status.rate_limited_until <= time.monotonic()
+    
+    def _open_circuit(self, index: int) -> None:
+        """Stop routing requests to an account until its breaker timeout elapses"""
+        status = self.account_status[index]
+        status.circuit = "OPEN"
+        self._circuit_closed[index] = False
+        status.circuit_opened_at = time.monotonic()
+        status.circuit_probing = False
+        self._log_sampled(index, log_warning, f"Circuit opened for account {self.accounts[index]['account_id']} for {status.circuit_timeout:.0f} seconds")
+    
+    def _log_sampled(self, index: int, log_func: Callable[..., Any], message: str, *args: Any) -> None:
+        """Log a message about an account, keeping at most LOG_SAMPLE_PER_MINUTE per minute
+        
+        Messages over the budget are counted and the count is reported with the
+        next message that gets through.
+        """
         status = self.account_status[index]
-        if status["rate_limited_until"] and status["rate_limited_until"] > datetime.now():
-            return False
-        return True
+        now = time.monotonic()
+        tokens = min(LOG_SAMPLE_PER_MINUTE,
+                     status.log_tokens + (now - status.log_refilled_at) * LOG_SAMPLE_PER_MINUTE / 60)
+        status.log_refilled_at = now
+        if tokens < 1:
+            status.log_tokens = tokens
+            status.log_dropped += 1
+            return
+        
+        status.log_tokens = tokens - 1
+        if status.log_dropped:
+            message = f"{message} (suppressed {status.log_dropped} messages for account {self.accounts[index]['account_id']})"
+            status.log_dropped = 0
+        log_func(message, *args)
     
-    def mark_rate_limited(self, index, minutes=None):
-        """Mark an account as rate limited for a specified time with dynamic cooldown"""
+    def mark_rate_limited(self, index: int, minutes: Optional[float] = None, retry_after: Optional[float] = None) -> None:
+        """Mark an account as rate limited for a specified time with dynamic cooldown
+        
+        When the server sent a Retry-After delay (in seconds) it is used as-is
+        instead of the guessed cooldown.
+        """
         status = self.account_status[index]
         
         # Increase cooldown multiplier based on consecutive failures
-        status["consecutive_failures"] += 1
-        status["cooldown_multiplier"] = min(5.0, status["cooldown_multiplier"] * 1.5)  # Cap at 5x
+        status.consecutive_failures += 1
         
-        # Calculate dynamic cooldown based on failure history
-        base_cooldown = minutes or RATE_LIMIT_COOLDOWN
-        dynamic_cooldown = base_cooldown * status["cooldown_multiplier"]
+        if retry_after is not None:
+            # Server-authoritative cooldown
+            dynamic_cooldown = retry_after / 60
+        else:
+            status.cooldown_multiplier = min(5.0, status.cooldown_multiplier * 1.5)  # Cap at 5x
+            
+            # Calculate dynamic cooldown based on failure history
+            base_cooldown = minutes or RATE_LIMIT_COOLDOWN
+            dynamic_cooldown = base_cooldown * status.cooldown_multiplier
+        
+        status.rate_limit_hits += 1
         
         # Update rate limit expiry
-        status["rate_limited_until"] = datetime.now() + timedelta(minutes=dynamic_cooldown)
-        status["failures"] += 1
-        status["total_failures"] += 1
+        status.rate_limited_until = time.monotonic() + dynamic_cooldown * 60
+        self._rate_limited_until[index] = status.rate_limited_until
+        status.failures += 1
+        status.total_failures += 1
         
         # Update health score (decrease more for rate limits)
         self._update_health_score(index, -15)
         
         # Log with dynamic cooldown information
         account = self.accounts[index]
-        log_warning(f"Account {account['account_id']} rate limited for {dynamic_cooldown:.1f} minutes (health: {status['health_score']}%)")
+        self._log_sampled(index, log_warning, f"Account {account['account_id']} rate limited for {dynamic_cooldown:.1f} minutes (health: {status.health_score}%)")
     
-    def mark_success(self, index):
+    def mark_success(self, index: int) -> None:
         """Mark an account as having a successful API call"""
         status = self.account_status[index]
-        status["last_success"] = datetime.now()
-        status["last_used"] = datetime.now()
-        status["failures"] = 0  # Reset consecutive failures
-        status["consecutive_failures"] = 0  # Reset consecutive failures counter
-        status["total_requests"] += 1
+        now = time.monotonic()
+        status.last_success = now
+        status.last_used = now
+        self._last_used[index] = now
+        status.failures = 0  # Reset consecutive failures
+        status.consecutive_failures = 0  # Reset consecutive failures counter
+        status.total_requests += 1
+        
+        # A successful call (including a half-open probe) closes the circuit
+        status.circuit = "CLOSED"
+        self._circuit_closed[index] = True
+        status.circuit_timeout = float(BREAKER_TIMEOUT)
+        status.circuit_probing = False
         
         # Gradually recover cooldown multiplier
-        status["cooldown_multiplier"] = max(1.0, status["cooldown_multiplier"] * 0.8)
+        status.cooldown_multiplier = max(1.0, status.cooldown_multiplier * 0.8)
         
         # Improve health score slightly with each success
         self._update_health_score(index, 5)
     
-    def mark_failure(self, index, is_rate_limit=False):
+    def mark_failure(self, index: int, is_rate_limit: bool = False, retry_after: Optional[float] = None) -> None:
         """Mark an account as having a failed API call"""
         status = self.account_status[index]
-        status["failures"] += 1
-        status["consecutive_failures"] += 1
-        status["total_failures"] += 1
-        status["last_used"] = datetime.now()
+        status.failures += 1
+        status.consecutive_failures += 1
+        status.total_failures += 1
+        status.last_used = time.monotonic()
+        self._last_used[index] = status.last_used
         
         # Update health score (general failures impact less than rate limits)
         self._update_health_score(index, -10)
         
+        # A failed probe re-opens the circuit for twice as long
+        if status.circuit == "HALF_OPEN":
+            status.circuit_timeout = min(BREAKER_MAX_TIMEOUT, status.circuit_timeout * 2)
+            self._open_circuit(index)
+        elif status.circuit == "CLOSED" and status.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+            self._open_circuit(index)
+        
         if is_rate_limit:
-            self.mark_rate_limited(index)
-        elif status["consecutive_failures"] >= 3:
+            self.mark_rate_limited(index, retry_after=retry_after)
+        elif status.consecutive_failures >= 3:
             # After 3 consecutive failures that aren't rate limits, 
             # temporarily disable the account as it might have other issues
-            cooldown_minutes = min(30, 5 * status["consecutive_failures"])
-            status["rate_limited_until"] = datetime.now() + timedelta(minutes=cooldown_minutes)
-            log_warning(f"Account {self.accounts[index]['account_id']} disabled for {cooldown_minutes} minutes due to {status['consecutive_failures']} consecutive failures")
+            cooldown_minutes = min(30, 5 * status.consecutive_failures)
+            status.rate_limited_until = time.monotonic() + cooldown_minutes * 60
+            self._rate_limited_until[index] = status.rate_limited_until
+            self._log_sampled(index, log_warning, f"Account {self.accounts[index]['account_id']} disabled for {cooldown_minutes} minutes due to {status.consecutive_failures} consecutive failures")
     
-    def _update_health_score(self, index, change):
+    def _update_health_score(self, index: int, change: int) -> None:
         """Update the health score of an account"""
         status = self.account_status[index]
-        status["health_score"] = max(0, min(100, status["health_score"] + change))
+        status.health_score = max(0, min(100, status.health_score + change))
+        self._health_scores[index] = status.health_score
     
-    def switch_account(self):
+    def switch_account(self) -> dict[str, str]:
         """Switch to the next available account using health scores and smart selection"""
-        # First try to find a healthy account that's available
-        best_score = -1
-        best_index = None
-        
-        # Find account with highest health score that's available
-        for i, status in self.account_status.items():
-            if self.is_account_available(i) and status["health_score"] > best_score:
-                best_score = status["health_score"]
-                best_index = i
-        
-        # If we found a healthy account with good health, use it immediately
-        if best_index is not None and best_score > 70:  # Increased threshold for higher quality
-            self.current_index = best_index
-            return self.get_active_account()
-        
-        # If no healthy account found or all have low scores, try least recently used available account
-        least_recent_time = None
-        least_recent_index = None
+        available = self._rate_limited_until <= time.monotonic()
         
-        for i, status in self.account_status.items():
-            if self.is_account_available(i):
-                if status["last_used"] is None or (least_recent_time is None or status["last_used"] < least_recent_time):
-                    least_recent_time = status["last_used"]
-                    least_recent_index = i
+        # Accounts with a tripped circuit breaker need the full availability check
+        for i in np.flatnonzero(available & ~self._circuit_closed):
+            available[i] = self.is_account_available(int(i))
         
-        if least_recent_index is not None:
-            self.current_index = least_recent_index
+        if available.any():
+            # Find account with highest health score that's available
+            scores = np.where(available, self._health_scores, -1)
+            best_index = int(np.argmax(scores))
+            
+            # If we found a healthy account with good health, use it immediately
+            if scores[best_index] > 70:  # Increased threshold for higher quality
+                self.current_index = best_index
+                return self.get_active_account()
+            
+            # If all available accounts have low scores, try the least recently used one
+            self.current_index = int(np.argmin(np.where(available, self._last_used, np.inf)))
             return self.get_active_account()
         
         # If all accounts are rate limited, use the one with the earliest expiry
-        earliest_expiry = None
-        earliest_index = None
-        
-        for i, status in self.account_status.items():
-            if status["rate_limited_until"]:
-                if earliest_expiry is None or status["rate_limited_until"] < earliest_expiry:
-                    earliest_expiry = status["rate_limited_until"]
-                    earliest_index = i
-        
-        if earliest_index is not None:
+        expiry = np.where(self._rate_limited_until > 0, self._rate_limited_until, np.inf)
+        earliest_index = int(np.argmin(expiry))
+        if np.isfinite(expiry[earliest_index]):
             self.current_index = earliest_index
         
         return self.get_active_account()
 
-    def run(self, model, inputs):
+    def _switch_to_untried(self, tried_accounts: set[str]) -> None:
+        """Switch accounts, falling back to the first untried one if smart selection repeats itself"""
+        if self.switch_account()["account_id"] in tried_accounts:
+            for i, account in enumerate(self.accounts):
+                if account["account_id"] not in tried_accounts:
+                    self.current_index = i
+                    break
+    
+    def _parse_retry_after(self, headers: Mapping[str, str]) -> Optional[float]:
+        """Return the server's Retry-After delay in seconds, or None if absent or invalid"""
+        value = headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        
+        # Retry-After may also be an HTTP date
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    
+    def _apply_rate_headers(self, index: int, headers: Mapping[str, str]) -> None:
+        """Rest an account until its reset time when the server reports it is nearly out of requests"""
+        remaining_header = headers.get("x-ratelimit-remaining-requests")
+        reset_header = headers.get("x-ratelimit-reset")
+        if remaining_header is None or reset_header is None:
+            return
+        try:
+            remaining = int(remaining_header)
+            reset = float(reset_header)
+        except ValueError:
+            return
+        
+        if not math.isfinite(reset):
+            return
+        if reset > 1e9:
+            reset -= time.time()  # Some providers send the reset as a Unix timestamp, not a delay
+        
+        if remaining <= RATE_LIMIT_REMAINING_THRESHOLD:
+            status = self.account_status[index]
+            # Never rest an account longer than a detected rate limit would
+            until = time.monotonic() + min(max(reset, 0.0), RATE_LIMIT_COOLDOWN * 60)
+            if status.rate_limited_until < until:
+                status.rate_limited_until = until
+                self._rate_limited_until[index] = until
+    
+    def _handle_rate_limit_status(self, account_index: int, account_id: str, api_key_prefix: str,
+                                  status_code: int, body_text: str, headers: Mapping[str, str]) -> None:
+        """Handle rate limiting (common status codes for rate limits)"""
+        error_msg = f"Rate limit detected for account {account_id}: {status_code} - {body_text}"
+        self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix, status_code)
+        
+        # Mark this account as rate limited, honouring the server's Retry-After
+        self.mark_failure(account_index, is_rate_limit=True, retry_after=self._parse_retry_after(headers))
+    
+    def _handle_auth_status(self, account_index: int, account_id: str, api_key_prefix: str,
+                            status_code: int, body_text: str, headers: Mapping[str, str]) -> None:
+        """Handle authentication errors (likely bad API key)"""
+        error_msg = f"Authentication error for account {account_id}: {status_code} - {body_text}"
+        self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix, status_code)
+        
+        # Mark with higher penalty - this is likely a bad key
+        status = self.account_status[account_index]
+        status.consecutive_failures += 2  # Count as multiple failures
+        self.mark_failure(account_index)
+        self._update_health_score(account_index, -25)  # Larger health penalty
+        
+        # Retrying a rejected key only burns time, so stop using it right away
+        if status.circuit == "CLOSED":
+            self._open_circuit(account_index)
+    
+    def _handle_generic_status(self, account_index: int, account_id: str, api_key_prefix: str,
+                               status_code: int, body_text: str, headers: Mapping[str, str]) -> None:
+        """Handle other API errors"""
+        error_msg = f"API Error for account {account_id}: {status_code} - {body_text}"
+        self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix, status_code)
+        
+        # Mark as a general failure
+        self.mark_failure(account_index)
+    
+    def _handle_error_status(self, account_index: int, status_code: int, body_text: str, headers: Mapping[str, str]) -> None:
+        """Log a non-200 response and update the account's status accordingly"""
+        handler = _STATUS_HANDLERS.get(status_code, AutoXAIManager._handle_generic_status)
+        handler(self, account_index, self.accounts[account_index]["account_id"],
+                self.account_status[account_index].api_key_prefix, status_code,
+                body_text[:ERROR_BODY_LOG_LIMIT],  # Keep large error pages out of the log
+                headers)
+    
+    def _cache_key(self, model: str, inputs: Any) -> bytes:
+        """Return a stable hash of the model and canonicalized inputs"""
+        if orjson is not None:
+            payload = orjson.dumps(inputs, option=orjson.OPT_SORT_KEYS)
+        else:
+            payload = json.dumps(inputs, sort_keys=True, separators=(",", ":")).encode()
+        return hashlib.blake2b(model.encode() + b"\0" + payload, digest_size=16).digest()
+    
+    def _cache_get(self, key: bytes) -> Any:
+        """Return a freshly decoded copy of a cached response that is still fresh, or None"""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > RESPONSE_CACHE_TTL:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+        # Decoding per hit hands each caller its own object, so mutating a result never touches the cache
+        return _json_loads(entry[1])
+    
+    def _cache_put(self, key: bytes, content: bytes) -> None:
+        """Store a successful response body, evicting the least recently used one when full"""
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), content)
+            self._cache.move_to_end(key)
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _backoff_time(self, retries: int) -> float:
+        """Return how long to wait before the given retry"""
+        # Use a smaller backoff for the first retry to fail fast
+        if retries == 1:
+            return BACKOFF_BASE
+        return BACKOFF_BASE * (2 ** (retries - 1))  # Exponential backoff
+    
+    def _all_failed(self, start_time: float, retries: int, tried_accounts: set[str]) -> dict[str, Any]:
+        """Log and build the result returned when every retry failed"""
+        elapsed = time.time() - start_time
+        log_error(f"All API accounts failed after {elapsed:.2f}s and {retries} retries")
+        return {"error": "All API accounts failed", "retry_after": 60, "accounts_tried": list(tried_accounts)}
+
+    def run(self, model: str, inputs: Any) -> Any:
+        if not self.accounts:
+            return {"error": "No API accounts configured"}
+        
+        # Identical recent requests are answered from the response cache
+        cache_key = self._cache_key(model, inputs)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
         retries = 0
-        tried_accounts = set()  # Track which accounts we've already tried
+        tried_accounts: set[str] = set()  # Track which accounts we've already tried
         start_time = time.time()
+        body = _json_dumps({"messages": inputs})  # Encoded once, reused by every retry
         
         while retries < RETRY_LIMIT:
             account = self.get_active_account()
@@ -167,73 +481,59 @@ class AutoXAIManager:
             
             # Skip if we've already tried this account in this run (unless we've tried all accounts)
             if account_id in tried_accounts and len(tried_accounts) < len(self.accounts):
-                self.switch_account()
+                self._switch_to_untried(tried_accounts)
                 continue
                 
             tried_accounts.add(account_id)
-            api_key = account["api_key"]
-            url = API_BASE_URL.format(account_id)
-            headers = {"Authorization": f"Bearer {api_key}"}
-            
-            # For security, only show first few chars of API key in logs
-            api_key_prefix = api_key[:4] + "..." if len(api_key) > 4 else "***"
+            status = self.account_status[account_index]
+            api_key_prefix = status.api_key_prefix
+            probing = status.circuit == "HALF_OPEN"
+            if probing:
+                status.circuit_probing = True  # This request is the account's single probe
             
             try:
+                request_start = time.perf_counter()
                 # Add timeout to prevent hanging requests
-                response = requests.post(
-                    url + model, 
-                    headers=headers, 
-                    json={"messages": inputs},
-                    timeout=REQUEST_TIMEOUT
+                response = self.session.post(
+                    status.url_base + model, 
+                    headers=status.headers, 
+                    data=body,
+                    timeout=REQUEST_TIMEOUT,
+                    stream=True
                 )
+                try:
+                    # Only a successful body is read in full; error pages just need enough to log
+                    if response.status_code == 200:
+                        content = response.content
+                    else:
+                        content = response.raw.read(ERROR_BODY_LOG_LIMIT, decode_content=True)
+                finally:
+                    response.close()
+                self._record_latency(account_index, time.perf_counter() - request_start)
+                self._apply_rate_headers(account_index, response.headers)
                 
                 # Handle successful response
                 if response.status_code == 200:
                     # Mark this account as successful
                     self.mark_success(account_index)
-                    
-                    # Log success with timing information
-                    elapsed = time.time() - start_time
                     if retries > 0:
-                        log_warning(f"API call succeeded after {retries} retries in {elapsed:.2f}s using account {account_id}")
+                        status.retried_successes += 1
                     
-                    return response.json()
+                    result = _json_loads(content)
+                    self._cache_put(cache_key, content)
+                    return result
                 
-                # Handle rate limiting (common status codes for rate limits)
-                elif response.status_code in [429, 403, 503]:
-                    error_msg = f"Rate limit detected for account {account_id}: {response.status_code} - {response.text}"
-                    log_error(error_msg, account_id, api_key_prefix, response.status_code)
-                    
-                    # Mark this account as rate limited
-                    self.mark_failure(account_index, is_rate_limit=True)
-                
-                # Handle authentication errors (likely bad API key)
-                elif response.status_code in [401, 403]:
-                    error_msg = f"Authentication error for account {account_id}: {response.status_code} - {response.text}"
-                    log_error(error_msg, account_id, api_key_prefix, response.status_code)
-                    
-                    # Mark with higher penalty - this is likely a bad key
-                    status = self.account_status[account_index]
-                    status["consecutive_failures"] += 2  # Count as multiple failures
-                    self.mark_failure(account_index)
-                    self._update_health_score(account_index, -25)  # Larger health penalty
-                
-                # Handle other API errors
-                else:
-                    error_msg = f"API Error for account {account_id}: {response.status_code} - {response.text}"
-                    log_error(error_msg, account_id, api_key_prefix, response.status_code)
-                    
-                    # Mark as a general failure
-                    self.mark_failure(account_index)
+                self._handle_error_status(account_index, response.status_code,
+                                          content.decode("utf-8", "replace"), response.headers)
             
             except requests.exceptions.Timeout:
                 error_msg = f"Request timeout for account {account_id}"
-                log_error(error_msg, account_id, api_key_prefix)
+                self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix)
                 self.mark_failure(account_index)
             
             except requests.exceptions.ConnectionError as e:
                 error_msg = f"Connection error for account {account_id}: {str(e)}"
-                log_error(error_msg, account_id, api_key_prefix)
+                self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix)
                 self.mark_failure(account_index)
                 
                 # Connection errors might be temporary network issues
@@ -242,27 +542,350 @@ class AutoXAIManager:
             
             except Exception as e:
                 error_msg = f"Exception for account {account_id}: {str(e)}"
-                log_error(error_msg, account_id, api_key_prefix)
+                self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix)
                 self.mark_failure(account_index)
             
+            finally:
+                # An interrupted probe must not leave the account rejected forever
+                if probing:
+                    status.circuit_probing = False
+            
             # Switch to the next account on failure - use smart selection
             self.switch_account()
             retries += 1
             
             # Implement smarter backoff - shorter for first retry, longer for subsequent
             if retries < RETRY_LIMIT:
-                # Use a smaller backoff for the first retry to fail fast
-                if retries == 1:
-                    backoff_time = BACKOFF_BASE
-                else:
-                    backoff_time = BACKOFF_BASE * (2 ** (retries - 1))  # Exponential backoff
+                time.sleep(self._backoff_time(retries))
+
+        # All retries failed
+        return self._all_failed(start_time, retries, tried_accounts)
+    
+    def _aimd_decrease(self, index: int) -> None:
+        """Halve an account's async concurrency cap after overload signals"""
+        status = self.account_status[index]
+        status.aimd_successes = 0
+        concurrency = max(1, int(status.concurrency * 0.5))
+        if concurrency != status.concurrency:
+            # Shrink the one shared semaphore; _acquire_permit() retires the surplus as permits come free
+            status.permit_debt += status.concurrency - concurrency
+            status.concurrency = concurrency
+    
+    def _aimd_record_success(self, index: int, latency: float) -> None:
+        """Grow an account's async concurrency cap after sustained fast successes"""
+        status = self.account_status[index]
+        latencies = status.latencies
+        latencies.append(latency)
+        
+        # Provider is slowing down even though calls succeed - back off early
+        if len(latencies) == latencies.maxlen and sum(latencies) / len(latencies) > AIMD_LATENCY_TARGET:
+            latencies.clear()
+            self._aimd_decrease(index)
+            return
+        
+        status.aimd_successes += 1
+        if status.aimd_successes >= AIMD_INCREASE_AFTER and status.concurrency < AIMD_MAX_CONCURRENCY:
+            status.aimd_successes = 0
+            status.concurrency += 1
+            if status.permit_debt:
+                status.permit_debt -= 1  # Keep a permit that was due to be retired
+            else:
+                status.sem.release()  # One more permit for the larger cap
+    
+    async def _acquire_permit(self, status: AccountStatus) -> None:
+        """Take a permit from the account's semaphore, first retiring any owed by a decrease
+        
+        A retired permit is acquired and never released, so in-flight requests
+        drain down to the reduced cap instead of being joined by a fresh set.
+        """
+        await status.sem.acquire()
+        while status.permit_debt > 0:
+            status.permit_debt -= 1
+            await status.sem.acquire()
+    
+    def _get_async_client(self) -> Any:
+        """Return the HTTP/2 client for the running event loop, creating it on first use
+        
+        Concurrent requests to the same host are multiplexed as streams over
+        one connection instead of each holding its own socket.
+        """
+        if httpx is None:
+            raise RuntimeError("httpx is required for async API calls")
+        
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client.is_closed or self._async_client_loop is not loop:
+            self._discard_async_client()
+            limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+            self._async_client = httpx.AsyncClient(http2=True, limits=limits, timeout=REQUEST_TIMEOUT)
+            self._async_client_loop = loop
+        return self._async_client
+    
+    def _discard_async_client(self) -> None:
+        """Close a client left behind by another event loop, on that loop if it is still running"""
+        client, loop = self._async_client, self._async_client_loop
+        self._async_client = self._async_client_loop = None
+        if client is None or client.is_closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the manager's event loop, starting its thread on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="autox-ai-manager-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+    
+    def submit(self, model: str, inputs: Any) -> concurrent.futures.Future:
+        """Schedule arun() on the manager's event loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(self.arun(model, inputs), self._get_loop())
+    
+    async def arun_threadsafe(self, model: str, inputs: Any) -> Any:
+        """Await arun() on the manager's event loop from a caller running its own loop
+        
+        Use this instead of arun() when several threads with their own event
+        loops share one manager, such as the process-wide get_ai_manager().
+        """
+        return await asyncio.wrap_future(self.submit(model, inputs))
+    
+    async def arun(self, model: str, inputs: Any) -> Any:
+        """Async variant of run() that waits on the network without blocking the event loop
+        
+        Loop-bound state is shared between calls, so every call on one manager
+        must come from the same event loop; see arun_threadsafe().
+        """
+        if not self.accounts:
+            return {"error": "No API accounts configured"}
+        
+        # Identical recent requests are answered from the response cache
+        cache_key = self._cache_key(model, inputs)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Join an identical request that is already in flight instead of sending another
+        flight = self._inflight.get(cache_key)
+        if flight is None:
+            task = asyncio.get_running_loop().create_task(self._arun_request(model, inputs, cache_key))
+            flight = self._inflight[cache_key] = _Flight(task)
+            task.add_done_callback(lambda _: self._end_flight(cache_key, flight))
+        
+        # Every caller, the first included, waits through shield, so one caller's
+        # cancellation never reaches the others; the request stops once nobody waits
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+                self._end_flight(cache_key, flight)  # Later callers start a fresh request
+    
+    def _end_flight(self, cache_key: bytes, flight: _Flight) -> None:
+        """Stop routing callers to flight, unless a newer request already took its place"""
+        if self._inflight.get(cache_key) is flight:
+            del self._inflight[cache_key]
+    
+    async def _read_error_body(self, response: Any) -> bytes:
+        """Read at most ERROR_BODY_LOG_LIMIT bytes of a streamed error response"""
+        content = bytearray()
+        async for chunk in response.aiter_bytes():
+            content += chunk
+            if len(content) >= ERROR_BODY_LOG_LIMIT:
+                break
+        return bytes(content[:ERROR_BODY_LOG_LIMIT])
+    
+    async def _arun_request(self, model: str, inputs: Any, cache_key: bytes) -> Any:
+        """Send one async request with account rotation and retries"""
+        retries = 0
+        tried_accounts: set[str] = set()  # Track which accounts we've already tried
+        start_time = time.time()
+        client = self._get_async_client()
+        body = _json_dumps({"messages": inputs})  # Encoded once, reused by every retry
+        
+        while retries < RETRY_LIMIT:
+            account = self.get_active_account()
+            account_index = self.current_index
+            account_id = account["account_id"]
+            
+            # Skip if we've already tried this account in this run (unless we've tried all accounts)
+            if account_id in tried_accounts and len(tried_accounts) < len(self.accounts):
+                self._switch_to_untried(tried_accounts)
+                continue
+                
+            tried_accounts.add(account_id)
+            status = self.account_status[account_index]
+            api_key_prefix = status.api_key_prefix
+            probing = status.circuit == "HALF_OPEN"
+            if probing:
+                status.circuit_probing = True  # This request is the account's single probe
+            
+            try:
+                # Cap in-flight requests per account to stay under the provider's limit
+                await self._acquire_permit(status)
+                try:
+                    request_start = time.perf_counter()
+                    async with client.stream("POST", status.url_base + model, headers=status.headers,
+                                             content=body) as response:
+                        # Only a successful body is read in full; error pages just need enough to log
+                        if response.status_code == 200:
+                            content = await response.aread()
+                        else:
+                            content = await self._read_error_body(response)
+                finally:
+                    status.sem.release()
+                latency = time.perf_counter() - request_start
+                self._record_latency(account_index, latency)
+                self._apply_rate_headers(account_index, response.headers)
+                
+                # Handle successful response
+                if response.status_code == 200:
+                    # Mark this account as successful
+                    self.mark_success(account_index)
+                    self._aimd_record_success(account_index, latency)
+                    if retries > 0:
+                        status.retried_successes += 1
+                    
+                    result = _json_loads(content)
+                    self._cache_put(cache_key, content)
+                    return result
+                
+                if response.status_code in (429, 503):
+                    self._aimd_decrease(account_index)
+                self._handle_error_status(account_index, response.status_code,
+                                          content.decode("utf-8", "replace"), response.headers)
+            
+            except httpx.TimeoutException:
+                error_msg = f"Request timeout for account {account_id}"
+                self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix)
+                self.mark_failure(account_index)
+                self._aimd_decrease(account_index)
+            
+            except httpx.TransportError as e:
+                error_msg = f"Connection error for account {account_id}: {str(e)}"
+                self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix)
+                self.mark_failure(account_index)
                 
-                time.sleep(backoff_time)
+                # Connection errors might be temporary network issues
+                # Use a shorter backoff
+                await asyncio.sleep(BACKOFF_BASE)
+            
+            except Exception as e:
+                error_msg = f"Exception for account {account_id}: {str(e)}"
+                self._log_sampled(account_index, log_error, error_msg, account_id, api_key_prefix)
+                self.mark_failure(account_index)
+            
+            finally:
+                # A cancelled probe must not leave the account rejected forever
+                if probing:
+                    status.circuit_probing = False
+            
+            # Switch to the next account on failure - use smart selection
+            self.switch_account()
+            retries += 1
+            
+            # Back off without blocking other calls sharing the event loop
+            if retries < RETRY_LIMIT:
+                await asyncio.sleep(self._backoff_time(retries))
 
         # All retries failed
-        elapsed = time.time() - start_time
-        log_error(f"All API accounts failed after {elapsed:.2f}s and {retries} retries")
-        return {"error": "All API accounts failed", "retry_after": 60, "accounts_tried": list(tried_accounts)}
+        return self._all_failed(start_time, retries, tried_accounts)
+    
+    async def run_many(self, model: str, inputs_list: list[Any]) -> list[Any]:
+        """Run several prompts concurrently; results come back in input order and failed calls as exceptions
+        
+        The API has no batch endpoint, so each prompt is its own request;
+        identical prompts share one call through arun()'s in-flight map.
+        """
+        return await asyncio.gather(*[self.arun(model, inputs) for inputs in inputs_list], return_exceptions=True)
+    
+    def _record_latency(self, index: int, latency: float) -> None:
+        """Append a request latency to the account's metrics ring"""
+        status = self.account_status[index]
+        status.latency_ring[status.latency_count % METRICS_RING_SIZE] = latency
+        status.latency_count += 1
+    
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Per-account request counters and latency percentiles over the metrics ring"""
+        metrics = {}
+        for account, status in zip(self.accounts, self.account_status):
+            samples = status.latency_ring[:min(status.latency_count, METRICS_RING_SIZE)]
+            if len(samples) > 1:
+                quantiles = statistics.quantiles(samples, n=100)
+                p50, p95 = quantiles[49], quantiles[94]
+            else:
+                p50 = p95 = samples[0] if samples else None
+            metrics[account["account_id"]] = {
+                "requests": status.latency_count,
+                "successes": status.total_requests,
+                "failures": status.total_failures,
+                "rate_limited": status.rate_limit_hits,
+                "retried_successes": status.retried_successes,
+                "latency_p50": p50,
+                "latency_p95": p95
+            }
+        return metrics
+    
+    def prometheus_metrics(self) -> str:
+        """Render metrics() in the Prometheus text exposition format"""
+        lines = []
+        for account_id, values in self.metrics().items():
+            for name, value in values.items():
+                if value is not None:
+                    lines.append(f'autox_ai_{name}{{account_id="{account_id}"}} {value}')
+        return "\n".join(lines) + "\n"
+    
+    def close(self) -> None:
+        """Close the pooled HTTP sessions and stop the manager's event loop thread"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = self._loop_thread = None
+        if loop is not None:
+            if threading.current_thread() is thread:
+                # Called from a coroutine on the manager loop; the loop stops once it returns
+                loop.call_soon(loop.stop)
+            else:
+                client = self._async_client
+                if client is not None and self._async_client_loop is loop:
+                    try:
+                        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(REQUEST_TIMEOUT)
+                    except Exception as e:
+                        log_warning(f"Failed to close async AI client: {str(e)}")
+                    self._async_client = self._async_client_loop = None
+                loop.call_soon_threadsafe(loop.stop)
+                if thread is not None:
+                    thread.join()
+                loop.close()
+        self.session.close()
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP sessions, including the async one"""
+        client = self._async_client
+        if client is not None and self._async_client_loop is asyncio.get_running_loop() and not client.is_closed:
+            await client.aclose()
+        self.close()
+    
+    async def __aenter__(self) -> "AutoXAIManager":
+        return self
+    
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        await self.aclose()
+
+# Non-200 status code -> handler; anything not listed is a generic API error
+_STATUS_HANDLERS: dict[int, Callable[..., None]] = {
+    429: AutoXAIManager._handle_rate_limit_status,
+    503: AutoXAIManager._handle_rate_limit_status,
+    401: AutoXAIManager._handle_auth_status,
+    403: AutoXAIManager._handle_auth_status,
+}
+
+@lru_cache(maxsize=1)
+def get_ai_manager() -> AutoXAIManager:
+    """Return the process-wide AutoXAIManager, so account rotation state and connection pools are shared."""
+    return AutoXAIManager()
 
 # Example usage:
 if __name__ == "__main__":
@@ -1,15 +1,36 @@
 # api_manager_enhanced.py - Enhanced API management with health tracking and smart rotation
 
 import requests
+from requests.adapters import HTTPAdapter
 import random
 import time
 import math
 import json
 import os
-from datetime import datetime, timedelta
+import pickle
+import atexit
+import asyncio
+import threading
+import weakref
+import numpy as np
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from config import AUTOX_AI_ACCOUNTS, API_BASE_URL, RETRY_LIMIT, RATE_LIMIT_COOLDOWN, REQUEST_TIMEOUT, BACKOFF_BASE
 from logger import log_error, log_warning, log_info
 
+try:
+    import httpx
+except ImportError:
+    # httpx not available, only the synchronous run() can be used
+    httpx = None
+
+try:
+    from _hotpath import pick_best
+except ImportError:
+    # numba not available, switch_account uses the vectorized NumPy scan
+    pick_best = None
+
 # Constants for enhanced health tracking
 HEALTH_DECAY_RATE = 0.95  # How quickly health decays over time
 MIN_HEALTH_FOR_PRIMARY = 50  # Minimum health score to be considered as primary account
@@ -19,65 +40,148 @@ BLACKLIST_DURATION = 30  # Minutes to blacklist an account after MAX_CONSECUTIVE
 HEALTH_RECOVERY_RATE = 2  # Points recovered per successful call
 HEALTH_PENALTY_RATE = 10  # Points deducted per failure
 RESPONSE_TIME_WEIGHT = 0.3  # Weight for response time in health calculation
+RESPONSE_TIME_WINDOW = 10  # Recent response times kept per account
+HEALTH_SAVE_INTERVAL = 30  # Minimum seconds between health file writes
+LAST_ERROR_LIMIT = 500  # Characters of the last error message kept per account
+
+_LOG_DECAY_PER_HOUR = math.log(HEALTH_DECAY_RATE) / 24  # HEALTH_DECAY_RATE per day, as an hourly exponent
+_rng = random.Random()  # Private generator, so picking a start account never touches the shared one
+
+# Error kinds counted per account; anything else is counted as "general"
+ERR_KINDS = ("rate_limit", "auth", "api_error", "timeout", "connection", "unknown", "general")
+ERR_IDX = {kind: i for i, kind in enumerate(ERR_KINDS)}
+
+# Status fields holding Unix timestamps (None when unset); older health files stored
+# them as datetimes, or as ISO strings in the legacy JSON file
+_TS_FIELDS = ("rate_limited_until", "last_success", "last_used", "blacklisted_until")
+
+def _to_timestamp(value):
+    """Convert a saved time to Unix seconds, returning None for empty or malformed values"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value.timestamp() if isinstance(value, datetime) else None
+    except ValueError:
+        return None
+
+def _parse_retry_after(headers):
+    """Return the server's Retry-After delay in seconds, or None if absent or invalid"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    # Retry-After may also be an HTTP date
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+# Managers still alive; held weakly so the exit hook never keeps one from being collected
+_live_managers = weakref.WeakSet()
+
+def _flush_live_managers():
+    """Write pending status changes of every live manager on interpreter exit"""
+    for manager in list(_live_managers):
+        if manager._dirty:
+            manager._flush_account_status()
+
+atexit.register(_flush_live_managers)
 
 class EnhancedAPIManager:
     def __init__(self):
         self.accounts = AUTOX_AI_ACCOUNTS
-        self.current_index = random.randint(0, len(self.accounts) - 1)  # Start from a random account
+        self.current_index = _rng.randrange(len(self.accounts))  # Start from a random account
         
         # Enhanced account status tracking
-        self.account_status = {}
-        self.last_health_check = datetime.now()
-        self.health_check_file = os.path.join("storagex_data", "api_health.json")
+        self.account_status = []  # Indexed like self.accounts
+        self.last_health_check = time.time()
+        self.health_check_file = os.path.join("storagex_data", "api_health.pkl")
+        self.legacy_health_file = os.path.join("storagex_data", "api_health.json")  # Written by older versions
+        self._health_dir = os.path.dirname(self.health_check_file) or "."
+        self._dir_ready = False  # Set once the health directory has been created
+        
+        # Running sum and count of per-account average response times, for the global average
+        self._sum_of_avgs = 0.0
+        self._count_of_avgs = 0
+        
+        # Health file writes are debounced; _dirty marks changes not yet on disk
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._save_lock = threading.Lock()  # One writer of the health file at a time
+        self._save_task = None  # Pending off-loop write scheduled from arun()
+        
+        # Pooled keep-alive session so retries and repeat calls reuse open connections
+        self.session = requests.Session()
+        pool_size = max(1, len(self.accounts))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size * 2, max_retries=0)
+        self.session.mount("https://", adapter)
+        
+        # Async client is created lazily inside the event loop that first uses it
+        self._async_client = None
+        self._async_client_loop = None
+        
+        # Per-account request URL base, auth headers and log-safe key prefix, built once
+        self._precompute_account_derived()
         
         # Initialize or load account status
         self._initialize_account_status()
         
+        # Column copies of the numeric fields the health check and switch_account scan, as
+        # Unix timestamps; -inf marks an unset time, so never-used accounts sort first
+        n = len(self.accounts)
+        self._health = np.full(n, 100.0)
+        self._last_used_ts = np.full(n, -np.inf)
+        self._rate_until_ts = np.full(n, -np.inf)
+        self._bl_until_ts = np.full(n, -np.inf)
+        
+        # Per-account error counts, one column per ERR_KINDS entry
+        self._err_counts = np.zeros((n, len(ERR_KINDS)), dtype=np.uint32)
+        for i, status in enumerate(self.account_status):
+            self._mirror_status(i)
+            for kind, count in status.pop("error_types", {}).items():
+                self._err_counts[i, ERR_IDX.get(kind, ERR_IDX["general"])] += count
+        
+        # Write any pending changes on interpreter exit
+        _live_managers.add(self)
+        
         # Log initialization
         log_info(f"Enhanced API Manager initialized with {len(self.accounts)} accounts")
     
+    def _precompute_account_derived(self):
+        """Build the per-account values run() would otherwise recompute on every attempt.
+        
+        Kept off account_status so the API keys are never written to the health file.
+        """
+        self._url_bases = [API_BASE_URL.format(account["account_id"]) for account in self.accounts]
+        self._headers = [{"Authorization": f"Bearer {account['api_key']}"} for account in self.accounts]
+        self._key_prefixes = [
+            account["api_key"][:4] + "..." if len(account["api_key"]) > 4 else "***"
+            for account in self.accounts
+        ]
+    
     def _initialize_account_status(self):
         """Initialize account status or load from storage"""
         # Try to load existing health data
-        if os.path.exists(self.health_check_file):
+        if os.path.exists(self.health_check_file) or os.path.exists(self.legacy_health_file):
             try:
-                with open(self.health_check_file, 'r') as f:
-                    saved_status = json.load(f)
-                    
-                # Convert string timestamps back to datetime objects
-                for account_id, status in saved_status.items():
-                    if "rate_limited_until" in status and status["rate_limited_until"]:
-                        try:
-                            status["rate_limited_until"] = datetime.fromisoformat(status["rate_limited_until"])
-                        except (ValueError, TypeError):
-                            status["rate_limited_until"] = None
-                    
-                    if "last_success" in status and status["last_success"]:
-                        try:
-                            status["last_success"] = datetime.fromisoformat(status["last_success"])
-                        except (ValueError, TypeError):
-                            status["last_success"] = None
-                    
-                    if "last_used" in status and status["last_used"]:
-                        try:
-                            status["last_used"] = datetime.fromisoformat(status["last_used"])
-                        except (ValueError, TypeError):
-                            status["last_used"] = None
-                    
-                    if "blacklisted_until" in status and status["blacklisted_until"]:
-                        try:
-                            status["blacklisted_until"] = datetime.fromisoformat(status["blacklisted_until"])
-                        except (ValueError, TypeError):
-                            status["blacklisted_until"] = None
+                saved_status = self._load_saved_status()
                 
                 # Store the loaded status
-                for i, account in enumerate(self.accounts):
+                for account in self.accounts:
                     account_id = account["account_id"]
                     if account_id in saved_status:
-                        self.account_status[i] = saved_status[account_id]
+                        status = saved_status[account_id]
+                        self._restore_response_times(status)
                     else:
                         # Initialize new account
-                        self.account_status[i] = self._create_default_status()
+                        status = self._create_default_status()
+                    self.account_status.append(status)
             except Exception as e:
                 log_error(f"Error loading API health data: {str(e)}")
                 # Initialize with defaults if loading fails
@@ -86,10 +190,34 @@ class EnhancedAPIManager:
             # No saved data, initialize with defaults
             self._initialize_default_status()
     
+    def _load_saved_status(self):
+        """Read saved status keyed by account ID, falling back to the legacy JSON file"""
+        if os.path.exists(self.health_check_file):
+            with open(self.health_check_file, 'rb') as f:
+                saved_status = pickle.load(f)
+        else:
+            with open(self.legacy_health_file, 'r') as f:
+                saved_status = json.load(f)
+        
+        # Normalize saved times to Unix timestamps
+        for status in saved_status.values():
+            for field in _TS_FIELDS:
+                status[field] = _to_timestamp(status.get(field))
+        return saved_status
+    
+    def _restore_response_times(self, status):
+        """Rebuild a loaded account's response time window and fold it into the global average"""
+        status["response_times"] = deque(status.get("response_times") or (), maxlen=RESPONSE_TIME_WINDOW)
+        status["response_time_sum"] = sum(status["response_times"])
+        status["avg_response_time"] = None
+        if status["response_times"]:
+            status["avg_response_time"] = status["response_time_sum"] / len(status["response_times"])
+            self._sum_of_avgs += status["avg_response_time"]
+            self._count_of_avgs += 1
+    
     def _initialize_default_status(self):
         """Initialize all accounts with default status"""
-        for i, account in enumerate(self.accounts):
-            self.account_status[i] = self._create_default_status()
+        self.account_status = [self._create_default_status() for _ in self.accounts]
     
     def _create_default_status(self):
         """Create default status for a new account"""
@@ -105,54 +233,86 @@ class EnhancedAPIManager:
             "cooldown_multiplier": 1.0,  # Dynamic cooldown multiplier
             "last_used": None,  # Track when account was last used
             "avg_response_time": None,  # Track average response time
-            "response_times": [],  # Store recent response times
-            "error_types": {},  # Track types of errors
+            "response_times": deque(maxlen=RESPONSE_TIME_WINDOW),  # Store recent response times
+            "response_time_sum": 0.0,  # Running sum of response_times
             "last_error": None,  # Last error message
             "success_streak": 0  # Track consecutive successes
         }
     
-    def _save_account_status(self):
-        """Save account status to persistent storage"""
+    def _maybe_flush(self):
+        """Flush pending status changes once HEALTH_SAVE_INTERVAL has passed since the last write
+        
+        Inside an event loop the file write runs on a worker thread, so arun()
+        never blocks the loop on fsync.
+        """
+        if not (self._dirty and time.monotonic() - self._last_save > HEALTH_SAVE_INTERVAL):
+            return
         try:
-            # Create a serializable copy of the status
-            serializable_status = {}
-            
-            for i, status in self.account_status.items():
-                account_id = self.accounts[i]["account_id"]
-                # Create a copy to avoid modifying the original
-                status_copy = status.copy()
-                
-                # Convert datetime objects to ISO format strings
-                if "rate_limited_until" in status_copy and status_copy["rate_limited_until"]:
-                    status_copy["rate_limited_until"] = status_copy["rate_limited_until"].isoformat()
-                
-                if "last_success" in status_copy and status_copy["last_success"]:
-                    status_copy["last_success"] = status_copy["last_success"].isoformat()
-                
-                if "last_used" in status_copy and status_copy["last_used"]:
-                    status_copy["last_used"] = status_copy["last_used"].isoformat()
-                
-                if "blacklisted_until" in status_copy and status_copy["blacklisted_until"]:
-                    status_copy["blacklisted_until"] = status_copy["blacklisted_until"].isoformat()
-                
-                # Limit the size of response_times array
-                if "response_times" in status_copy and len(status_copy["response_times"]) > 10:
-                    status_copy["response_times"] = status_copy["response_times"][-10:]
-                
-                serializable_status[account_id] = status_copy
-            
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.health_check_file), exist_ok=True)
-            
-            # Save to file
-            with open(self.health_check_file, 'w') as f:
-                json.dump(serializable_status, f, indent=2)
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._flush_account_status()
+            return
+        if self._save_task is not None and not self._save_task.done():
+            return
+        try:
+            # Snapshot on the loop thread, where the status dicts are mutated
+            data = self._encode_account_status()
+        except Exception as e:
+            log_error(f"Error saving API health data: {str(e)}")
+            return
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._save_task = loop.create_task(asyncio.to_thread(self._write_account_status, data))
+    
+    def _encode_account_status(self):
+        """Pickle the account status, keyed by account ID so it survives changes to the account order"""
+        saved_status = {
+            self.accounts[i]["account_id"]: dict(status, error_types=self.get_error_counts(i))
+            for i, status in enumerate(self.account_status)
+        }
+        return pickle.dumps(saved_status, protocol=5)
+    
+    def _write_account_status(self, data):
+        """Atomically replace the health file with data"""
+        try:
+            with self._save_lock:
+                # Ensure directory exists, once per manager
+                if not self._dir_ready:
+                    os.makedirs(self._health_dir, exist_ok=True)
+                    self._dir_ready = True
                 
+                # Write to a temporary file and swap it in, so a crash mid-write never truncates saved state
+                tmp_file = self.health_check_file + ".tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.health_check_file)
             return True
         except Exception as e:
             log_error(f"Error saving API health data: {str(e)}")
             return False
     
+    def _flush_account_status(self):
+        """Save account status to persistent storage"""
+        try:
+            if not self._write_account_status(self._encode_account_status()):
+                return False
+            self._dirty = False
+            self._last_save = time.monotonic()
+            return True
+        except Exception as e:
+            log_error(f"Error saving API health data: {str(e)}")
+            return False
+    
+    def _mirror_status(self, index):
+        """Copy an account's health score and timestamps into the column arrays"""
+        status = self.account_status[index]
+        self._health[index] = status["health_score"]
+        self._last_used_ts[index] = status["last_used"] or -np.inf
+        self._rate_until_ts[index] = status["rate_limited_until"] or -np.inf
+        self._bl_until_ts[index] = status["blacklisted_until"] or -np.inf
+    
     def get_active_account(self):
         """Get the currently active account"""
         return self.accounts[self.current_index]
@@ -163,28 +323,33 @@ class EnhancedAPIManager:
             return self.account_status[index]
         return self.account_status
     
-    def is_account_available(self, index):
+    def get_error_counts(self, index):
+        """Get the non-zero error counts for an account, keyed by error kind"""
+        return {kind: int(count) for kind, count in zip(ERR_KINDS, self._err_counts[index]) if count}
+    
+    def is_account_available(self, index, now=None):
         """Check if an account is currently available (not rate limited or blacklisted)"""
+        now = now or time.time()
         status = self.account_status[index]
         
         # Check if rate limited
-        if status["rate_limited_until"] and status["rate_limited_until"] > datetime.now():
+        if status["rate_limited_until"] and status["rate_limited_until"] > now:
             return False
         
         # Check if blacklisted
-        if status["blacklisted_until"] and status["blacklisted_until"] > datetime.now():
+        if status["blacklisted_until"] and status["blacklisted_until"] > now:
             return False
             
         return True
     
-    def _update_health_score(self, index, change):
+    def _update_health_score(self, index, change, now=None):
         """Update the health score of an account with decay over time"""
         status = self.account_status[index]
         
         # Apply time-based decay if last used
         if status["last_used"]:
-            time_since_last_use = (datetime.now() - status["last_used"]).total_seconds() / 3600  # hours
-            decay_factor = HEALTH_DECAY_RATE ** (time_since_last_use / 24)  # Decay per day
+            time_since_last_use = ((now or time.time()) - status["last_used"]) / 3600  # hours
+            decay_factor = math.exp(_LOG_DECAY_PER_HOUR * time_since_last_use)  # Decay per day
             status["health_score"] = status["health_score"] * decay_factor
         
         # Apply the change
@@ -192,25 +357,13 @@ class EnhancedAPIManager:
     
     def _calculate_response_time_factor(self, index):
         """Calculate a factor based on response time compared to other accounts"""
-        status = self.account_status[index]
+        avg_time = self.account_status[index]["avg_response_time"]
         
-        if not status["response_times"]:
+        if avg_time is None or not self._count_of_avgs:
             return 1.0  # Neutral factor if no data
         
-        # Calculate average response time for this account
-        avg_time = sum(status["response_times"]) / len(status["response_times"])
-        
-        # Get average response times for all accounts with data
-        all_avg_times = []
-        for i, s in self.account_status.items():
-            if s["response_times"]:
-                all_avg_times.append(sum(s["response_times"]) / len(s["response_times"]))
-        
-        if not all_avg_times:
-            return 1.0  # Neutral factor if no data
-        
-        # Calculate global average
-        global_avg = sum(all_avg_times) / len(all_avg_times)
+        # Global average of the per-account averages, maintained incrementally
+        global_avg = self._sum_of_avgs / self._count_of_avgs
         
         # Return a factor that rewards faster-than-average accounts
         if global_avg == 0:
@@ -218,72 +371,96 @@ class EnhancedAPIManager:
             
         return global_avg / max(0.1, avg_time)  # Avoid division by zero
     
-    def mark_rate_limited(self, index, minutes=None):
-        """Mark an account as rate limited for a specified time with dynamic cooldown"""
+    def mark_rate_limited(self, index, minutes=None, now=None, retry_after=None):
+        """Mark an account as rate limited for a specified time with dynamic cooldown
+        
+        When the server sent a Retry-After delay (in seconds) it is used as-is
+        instead of the guessed cooldown.
+        """
+        now = now or time.time()
         status = self.account_status[index]
         
         # Increase cooldown multiplier based on consecutive failures
         status["consecutive_failures"] += 1
-        status["cooldown_multiplier"] = min(5.0, status["cooldown_multiplier"] * 1.5)  # Cap at 5x
         
-        # Calculate dynamic cooldown based on failure history
-        base_cooldown = minutes or RATE_LIMIT_COOLDOWN
-        dynamic_cooldown = base_cooldown * status["cooldown_multiplier"]
+        if retry_after is not None:
+            # Server-authoritative cooldown
+            dynamic_cooldown = retry_after / 60
+        else:
+            status["cooldown_multiplier"] = min(5.0, status["cooldown_multiplier"] * 1.5)  # Cap at 5x
+            
+            # Calculate dynamic cooldown based on failure history
+            base_cooldown = minutes or RATE_LIMIT_COOLDOWN
+            dynamic_cooldown = base_cooldown * status["cooldown_multiplier"]
         
         # Update rate limit expiry
-        status["rate_limited_until"] = datetime.now() + timedelta(minutes=dynamic_cooldown)
+        status["rate_limited_until"] = now + dynamic_cooldown * 60
         status["failures"] += 1
         status["total_failures"] += 1
         status["success_streak"] = 0  # Reset success streak
         
         # Track error type
-        status["error_types"]["rate_limit"] = status["error_types"].get("rate_limit", 0) + 1
+        self._err_counts[index, ERR_IDX["rate_limit"]] += 1
         status["last_error"] = "Rate limit exceeded"
         
         # Update health score (decrease more for rate limits)
-        self._update_health_score(index, -HEALTH_PENALTY_RATE * 1.5)
+        self._update_health_score(index, -HEALTH_PENALTY_RATE * 1.5, now)
         
         # Check if account should be blacklisted
         if status["consecutive_failures"] >= MAX_CONSECUTIVE_FAILURES:
-            self._blacklist_account(index)
+            self._blacklist_account(index, now)
         
         # Log with dynamic cooldown information
         account = self.accounts[index]
         log_warning(f"Account {account['account_id']} rate limited for {dynamic_cooldown:.1f} minutes (health: {status['health_score']:.1f}%)")
         
-        # Save status after significant change
-        self._save_account_status()
+        self._mirror_status(index)
+        self._dirty = True
+        self._maybe_flush()
     
-    def _blacklist_account(self, index):
+    def _blacklist_account(self, index, now=None):
         """Temporarily blacklist an account due to excessive failures"""
+        now = now or time.time()
         status = self.account_status[index]
         account = self.accounts[index]
         
         # Set blacklist duration
-        status["blacklisted_until"] = datetime.now() + timedelta(minutes=BLACKLIST_DURATION)
+        status["blacklisted_until"] = now + BLACKLIST_DURATION * 60
         
         # Severely penalize health score
-        self._update_health_score(index, -50)
+        self._update_health_score(index, -50, now)
+        
+        self._mirror_status(index)
+        self._dirty = True
         
         log_error(f"Account {account['account_id']} BLACKLISTED for {BLACKLIST_DURATION} minutes due to {status['consecutive_failures']} consecutive failures (health: {status['health_score']:.1f}%)")
     
-    def mark_success(self, index, response_time=None):
+    def mark_success(self, index, response_time=None, now=None):
         """Mark an account as having a successful API call"""
+        now = now or time.time()
         status = self.account_status[index]
-        status["last_success"] = datetime.now()
-        status["last_used"] = datetime.now()
+        status["last_success"] = now
+        status["last_used"] = now
         status["failures"] = 0  # Reset consecutive failures
         status["consecutive_failures"] = 0  # Reset consecutive failures counter
         status["total_requests"] += 1
         status["success_streak"] += 1  # Increment success streak
         
-        # Track response time
+        # Track response time, updating the window's running sum as the oldest entry drops out
         if response_time:
-            status["response_times"].append(response_time)
-            # Keep only the last 10 response times
-            if len(status["response_times"]) > 10:
-                status["response_times"] = status["response_times"][-10:]
-            status["avg_response_time"] = sum(status["response_times"]) / len(status["response_times"])
+            response_times = status["response_times"]
+            if len(response_times) == response_times.maxlen:
+                status["response_time_sum"] -= response_times[0]
+            response_times.append(response_time)
+            status["response_time_sum"] += response_time
+            
+            old_avg = status["avg_response_time"]
+            status["avg_response_time"] = status["response_time_sum"] / len(response_times)
+            if old_avg is None:
+                self._count_of_avgs += 1
+                self._sum_of_avgs += status["avg_response_time"]
+            else:
+                self._sum_of_avgs += status["avg_response_time"] - old_avg
         
         # Gradually recover cooldown multiplier
         status["cooldown_multiplier"] = max(1.0, status["cooldown_multiplier"] * 0.8)
@@ -294,29 +471,31 @@ class EnhancedAPIManager:
         
         # Improve health score with each success
         health_improvement = HEALTH_RECOVERY_RATE * response_time_factor + streak_bonus
-        self._update_health_score(index, health_improvement)
+        self._update_health_score(index, health_improvement, now)
         
         # Clear blacklist if present
         if status["blacklisted_until"]:
             status["blacklisted_until"] = None
             log_info(f"Account {self.accounts[index]['account_id']} removed from blacklist due to successful call")
         
-        # Periodically save status
-        if status["success_streak"] % 5 == 0 or status["health_score"] >= 95:
-            self._save_account_status()
+        self._mirror_status(index)
+        self._dirty = True
+        self._maybe_flush()
     
-    def mark_failure(self, index, is_rate_limit=False, error_type="general", error_message=None):
+    def mark_failure(self, index, is_rate_limit=False, error_type="general", error_message=None, now=None, retry_after=None):
         """Mark an account as having a failed API call with enhanced error tracking"""
+        now = now or time.time()
         status = self.account_status[index]
         status["failures"] += 1
         status["consecutive_failures"] += 1
         status["total_failures"] += 1
-        status["last_used"] = datetime.now()
+        status["last_used"] = now
         status["success_streak"] = 0  # Reset success streak
         
         # Track error type
-        status["error_types"][error_type] = status["error_types"].get(error_type, 0) + 1
-        status["last_error"] = error_message or f"Error type: {error_type}"
+        self._err_counts[index, ERR_IDX.get(error_type, ERR_IDX["general"])] += 1
+        # Error messages embed the response body, so keep only the start of it
+        status["last_error"] = (error_message or f"Error type: {error_type}")[:LAST_ERROR_LIMIT]
         
         # Update health score (general failures impact less than rate limits)
         penalty = HEALTH_PENALTY_RATE
@@ -324,119 +503,158 @@ class EnhancedAPIManager:
             # Authentication errors are more severe
             penalty *= 2
         
-        self._update_health_score(index, -penalty)
+        self._update_health_score(index, -penalty, now)
         
         if is_rate_limit:
-            self.mark_rate_limited(index)
+            self.mark_rate_limited(index, now=now, retry_after=retry_after)
         elif status["consecutive_failures"] >= MAX_CONSECUTIVE_FAILURES:
             # After MAX_CONSECUTIVE_FAILURES consecutive failures that aren't rate limits, 
             # temporarily blacklist the account
-            self._blacklist_account(index)
+            self._blacklist_account(index, now)
         elif status["consecutive_failures"] >= 3:
             # After 3 consecutive failures, apply a temporary cooldown
             cooldown_minutes = min(30, 5 * status["consecutive_failures"])
-            status["rate_limited_until"] = datetime.now() + timedelta(minutes=cooldown_minutes)
+            status["rate_limited_until"] = now + cooldown_minutes * 60
             log_warning(f"Account {self.accounts[index]['account_id']} disabled for {cooldown_minutes} minutes due to {status['consecutive_failures']} consecutive failures")
         
-        # Save status after significant change
-        if status["consecutive_failures"] >= 2:
-            self._save_account_status()
+        self._mirror_status(index)
+        self._dirty = True
+        self._maybe_flush()
     
-    def _run_health_check(self):
+    def _run_health_check(self, now=None):
         """Periodically run health checks on all accounts"""
+        now = now or time.time()
+        
         # Check if it's time for a health check
-        if (datetime.now() - self.last_health_check).total_seconds() < HEALTH_CHECK_INTERVAL:
+        if now - self.last_health_check < HEALTH_CHECK_INTERVAL:
             return
         
         log_info("Running API account health check...")
-        self.last_health_check = datetime.now()
-        
-        # Check each account
-        for i, account in enumerate(self.accounts):
-            status = self.account_status[i]
-            
-            # Apply time-based health decay
-            if status["last_used"]:
-                time_since_last_use = (datetime.now() - status["last_used"]).total_seconds() / 3600  # hours
-                if time_since_last_use > 24:
-                    # Decay health for unused accounts
-                    decay = (time_since_last_use / 24) * 5  # 5 points per day of non-use
-                    self._update_health_score(i, -min(20, decay))  # Cap at 20 points
-            
-            # Clear expired rate limits and blacklists
-            if status["rate_limited_until"] and status["rate_limited_until"] <= datetime.now():
-                status["rate_limited_until"] = None
-                log_info(f"Account {account['account_id']} rate limit expired")
-            
-            if status["blacklisted_until"] and status["blacklisted_until"] <= datetime.now():
-                status["blacklisted_until"] = None
-                log_info(f"Account {account['account_id']} removed from blacklist")
-        
-        # Save updated status
-        self._save_account_status()
+        self.last_health_check = now
+        
+        # Decay health for accounts unused for over a day: the usual per-day decay, then
+        # 5 points per day of non-use capped at 20
+        hours = (now - self._last_used_ts) / 3600
+        stale = np.isfinite(hours) & (hours > 24)
+        if stale.any():
+            decayed = self._health[stale] * np.exp(_LOG_DECAY_PER_HOUR * hours[stale])
+            decayed -= np.minimum(20, (hours[stale] / 24) * 5)
+            self._health[stale] = np.clip(decayed, 0, 100)
+            for i in np.flatnonzero(stale):
+                self.account_status[i]["health_score"] = float(self._health[i])
+        
+        # Clear expired rate limits and blacklists
+        expired = np.isfinite(self._rate_until_ts) & (self._rate_until_ts <= now)
+        for i in np.flatnonzero(expired):
+            self.account_status[i]["rate_limited_until"] = None
+            log_info(f"Account {self.accounts[i]['account_id']} rate limit expired")
+        self._rate_until_ts[expired] = -np.inf
+        
+        expired = np.isfinite(self._bl_until_ts) & (self._bl_until_ts <= now)
+        for i in np.flatnonzero(expired):
+            self.account_status[i]["blacklisted_until"] = None
+            log_info(f"Account {self.accounts[i]['account_id']} removed from blacklist")
+        self._bl_until_ts[expired] = -np.inf
+        
+        self._dirty = True
+        self._maybe_flush()
+    
+    def _pick_candidates(self, now):
+        """NumPy equivalent of _hotpath.pick_best, used when numba is not installed"""
+        available = (self._rate_until_ts <= now) & (self._bl_until_ts <= now)
+        if available.any():
+            best_index = int(np.where(available, self._health, -1).argmax())
+            if self._health[best_index] <= MIN_HEALTH_FOR_PRIMARY:
+                best_index = -1
+            return best_index, int(np.where(available, self._last_used_ts, np.inf).argmin()), -1
+        
+        expiries = np.fmin(
+            np.where(np.isfinite(self._rate_until_ts), self._rate_until_ts, np.inf),
+            np.where(np.isfinite(self._bl_until_ts), self._bl_until_ts, np.inf),
+        )
+        earliest_index = int(expiries.argmin())
+        return -1, -1, earliest_index if np.isfinite(expiries[earliest_index]) else -1
     
     def switch_account(self):
         """Switch to the next available account using enhanced health scores and smart selection"""
-        # Run a health check if needed
-        self._run_health_check()
+        now = time.time()
         
-        # Strategy 1: Find a healthy account that's available
-        best_score = -1
-        best_index = None
+        # Run a health check if needed
+        self._run_health_check(now)
         
-        # Find account with highest health score that's available
-        for i, status in self.account_status.items():
-            if self.is_account_available(i) and status["health_score"] > best_score:
-                best_score = status["health_score"]
-                best_index = i
+        if pick_best is not None:
+            best_index, lru_index, earliest_index = pick_best(
+                self._health, self._last_used_ts, self._rate_until_ts, self._bl_until_ts,
+                now, MIN_HEALTH_FOR_PRIMARY
+            )
+        else:
+            best_index, lru_index, earliest_index = self._pick_candidates(now)
         
-        # If we found a healthy account, use it
-        if best_index is not None and best_score > MIN_HEALTH_FOR_PRIMARY:
+        # Strategy 1: If we found a healthy account, use it
+        if best_index >= 0:
             self.current_index = best_index
             return self.get_active_account()
         
         # Strategy 2: Try least recently used available account
-        least_recent_time = None
-        least_recent_index = None
-        
-        for i, status in self.account_status.items():
-            if self.is_account_available(i):
-                if status["last_used"] is None or (least_recent_time is None or status["last_used"] < least_recent_time):
-                    least_recent_time = status["last_used"]
-                    least_recent_index = i
-        
-        if least_recent_index is not None:
-            self.current_index = least_recent_index
+        if lru_index >= 0:
+            self.current_index = lru_index
             return self.get_active_account()
         
         # Strategy 3: If all accounts are rate limited or blacklisted, use the one with the earliest expiry
-        earliest_expiry = None
-        earliest_index = None
-        
-        for i, status in self.account_status.items():
-            # Check rate limit expiry
-            if status["rate_limited_until"]:
-                if earliest_expiry is None or status["rate_limited_until"] < earliest_expiry:
-                    earliest_expiry = status["rate_limited_until"]
-                    earliest_index = i
-            
-            # Check blacklist expiry
-            if status["blacklisted_until"]:
-                if earliest_expiry is None or status["blacklisted_until"] < earliest_expiry:
-                    earliest_expiry = status["blacklisted_until"]
-                    earliest_index = i
-        
-        if earliest_index is not None:
+        if earliest_index >= 0:
             self.current_index = earliest_index
+            expiry = min(t for t in (self._rate_until_ts[earliest_index], self._bl_until_ts[earliest_index]) if np.isfinite(t))
+            earliest_expiry = datetime.fromtimestamp(expiry)
             log_warning(f"All accounts are unavailable. Using account {self.accounts[earliest_index]['account_id']} with earliest expiry at {earliest_expiry}")
         
         return self.get_active_account()
 
+    def _handle_error_status(self, account_index, account_id, api_key_prefix, status_code, text, headers, now):
+        """Log a non-200 response and record the failure against the account"""
+        # Handle rate limiting (common status codes for rate limits)
+        if status_code in (429, 503):
+            error_msg = f"Rate limit detected for account {account_id}: {status_code} - {text}"
+            log_error(error_msg, account_id, api_key_prefix, status_code)
+            
+            # Mark this account as rate limited
+            self.mark_failure(account_index, is_rate_limit=True, error_type="rate_limit", error_message=error_msg, now=now,
+                              retry_after=_parse_retry_after(headers))
+        
+        # Handle authentication errors (likely bad API key)
+        elif status_code in (401, 403):
+            error_msg = f"Authentication error for account {account_id}: {status_code} - {text}"
+            log_error(error_msg, account_id, api_key_prefix, status_code)
+            
+            # Mark with higher penalty - this is likely a bad key
+            self.mark_failure(account_index, error_type="auth", error_message=error_msg, now=now)
+        
+        # Handle other API errors
+        else:
+            error_msg = f"API Error for account {account_id}: {status_code} - {text}"
+            log_error(error_msg, account_id, api_key_prefix, status_code)
+            
+            # Mark as a general failure
+            self.mark_failure(account_index, error_type="api_error", error_message=error_msg, now=now)
+    
+    def _backoff_time(self, retries):
+        """Backoff before the next attempt - shorter for first retry, longer for subsequent"""
+        # Use a smaller backoff for the first retry to fail fast
+        if retries == 1:
+            return BACKOFF_BASE
+        return BACKOFF_BASE * (2 ** (retries - 1))  # Exponential backoff
+    
+    def _all_failed(self, start_time, retries, tried_mask):
+        """Log and build the result returned once every retry has failed"""
+        elapsed = time.monotonic() - start_time
+        log_error(f"All API accounts failed after {elapsed:.2f}s and {retries} retries")
+        return {"error": "All API accounts failed", "retry_after": 60, "accounts_tried": [account["account_id"] for i, account in enumerate(self.accounts) if tried_mask >> i & 1]}
+    
     def run(self, model, inputs):
         """Run an API call with enhanced error handling and account rotation"""
         retries = 0
-        tried_accounts = set()  # Track which accounts we've already tried
-        start_time = time.time()
+        tried_mask = 0  # Bit i set once account i has been tried
+        all_mask = (1 << len(self.accounts)) - 1
+        start_time = time.monotonic()
         
         while retries < RETRY_LIMIT:
             account = self.get_active_account()
@@ -444,64 +662,43 @@ class EnhancedAPIManager:
             account_id = account["account_id"]
             
             # Skip if we've already tried this account in this run (unless we've tried all accounts)
-            if account_id in tried_accounts and len(tried_accounts) < len(self.accounts):
+            bit = 1 << account_index
+            if tried_mask & bit and tried_mask != all_mask:
                 self.switch_account()
                 continue
                 
-            tried_accounts.add(account_id)
-            api_key = account["api_key"]
-            url = API_BASE_URL.format(account_id)
-            headers = {"Authorization": f"Bearer {api_key}"}
+            tried_mask |= bit
+            headers = self._headers[account_index]
             
             # For security, only show first few chars of API key in logs
-            api_key_prefix = api_key[:4] + "..." if len(api_key) > 4 else "***"
+            api_key_prefix = self._key_prefixes[account_index]
             
             try:
                 # Add timeout to prevent hanging requests
-                request_start = time.time()
-                response = requests.post(
-                    url + model, 
+                request_start = time.monotonic()
+                response = self.session.post(
+                    self._url_bases[account_index] + model, 
                     headers=headers, 
                     json={"messages": inputs},
                     timeout=REQUEST_TIMEOUT
                 )
-                request_time = time.time() - request_start
+                request_time = time.monotonic() - request_start
+                now = time.time()  # Shared by every status update for this attempt
                 
                 # Handle successful response
                 if response.status_code == 200:
                     # Mark this account as successful with response time
-                    self.mark_success(account_index, request_time)
+                    self.mark_success(account_index, request_time, now)
                     
                     # Log success with timing information
-                    elapsed = time.time() - start_time
+                    elapsed = time.monotonic() - start_time
                     if retries > 0:
                         log_warning(f"API call succeeded after {retries} retries in {elapsed:.2f}s using account {account_id}")
                     
                     return response.json()
                 
-                # Handle rate limiting (common status codes for rate limits)
-                elif response.status_code in [429, 503]:
-                    error_msg = f"Rate limit detected for account {account_id}: {response.status_code} - {response.text}"
-                    log_error(error_msg, account_id, api_key_prefix, response.status_code)
-                    
-                    # Mark this account as rate limited
-                    self.mark_failure(account_index, is_rate_limit=True, error_type="rate_limit", error_message=error_msg)
-                
-                # Handle authentication errors (likely bad API key)
-                elif response.status_code in [401, 403]:
-                    error_msg = f"Authentication error for account {account_id}: {response.status_code} - {response.text}"
-                    log_error(error_msg, account_id, api_key_prefix, response.status_code)
-                    
-                    # Mark with higher penalty - this is likely a bad key
-                    self.mark_failure(account_index, error_type="auth", error_message=error_msg)
-                
-                # Handle other API errors
-                else:
-                    error_msg = f"API Error for account {account_id}: {response.status_code} - {response.text}"
-                    log_error(error_msg, account_id, api_key_prefix, response.status_code)
-                    
-                    # Mark as a general failure
-                    self.mark_failure(account_index, error_type="api_error", error_message=error_msg)
+                self._handle_error_status(account_index, account_id, api_key_prefix, response.status_code,
+                                          response.text, response.headers, now)
             
             except requests.exceptions.Timeout:
                 error_msg = f"Request timeout for account {account_id}"
@@ -526,20 +723,110 @@ class EnhancedAPIManager:
             self.switch_account()
             retries += 1
             
-            # Implement smarter backoff - shorter for first retry, longer for subsequent
             if retries < RETRY_LIMIT:
-                # Use a smaller backoff for the first retry to fail fast
-                if retries == 1:
-                    backoff_time = BACKOFF_BASE
-                else:
-                    backoff_time = BACKOFF_BASE * (2 ** (retries - 1))  # Exponential backoff
+                time.sleep(self._backoff_time(retries))
+
+        # All retries failed
+        return self._all_failed(start_time, retries, tried_mask)
+    
+    def _get_async_client(self):
+        """Return the async client for the running event loop, creating it on first use"""
+        if httpx is None:
+            raise RuntimeError("httpx is required for async API calls")
+        
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client.is_closed or self._async_client_loop is not loop:
+            limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+            self._async_client = httpx.AsyncClient(http2=True, limits=limits, timeout=REQUEST_TIMEOUT)
+            self._async_client_loop = loop
+        return self._async_client
+    
+    async def arun(self, model, inputs):
+        """Async variant of run() that waits on the network and backoff without blocking the event loop"""
+        retries = 0
+        tried_mask = 0  # Bit i set once account i has been tried
+        all_mask = (1 << len(self.accounts)) - 1
+        start_time = time.monotonic()
+        client = self._get_async_client()
+        
+        while retries < RETRY_LIMIT:
+            account = self.get_active_account()
+            account_index = self.current_index
+            account_id = account["account_id"]
+            
+            # Skip if we've already tried this account in this run (unless we've tried all accounts)
+            bit = 1 << account_index
+            if tried_mask & bit and tried_mask != all_mask:
+                self.switch_account()
+                continue
+                
+            tried_mask |= bit
+            api_key_prefix = self._key_prefixes[account_index]
+            
+            try:
+                request_start = time.monotonic()
+                response = await client.post(
+                    self._url_bases[account_index] + model,
+                    headers=self._headers[account_index],
+                    json={"messages": inputs}
+                )
+                request_time = time.monotonic() - request_start
+                now = time.time()  # Shared by every status update for this attempt
+                
+                # Handle successful response
+                if response.status_code == 200:
+                    self.mark_success(account_index, request_time, now)
+                    
+                    elapsed = time.monotonic() - start_time
+                    if retries > 0:
+                        log_warning(f"API call succeeded after {retries} retries in {elapsed:.2f}s using account {account_id}")
+                    
+                    return response.json()
+                
+                self._handle_error_status(account_index, account_id, api_key_prefix, response.status_code,
+                                          response.text, response.headers, now)
+            
+            except httpx.TimeoutException:
+                error_msg = f"Request timeout for account {account_id}"
+                log_error(error_msg, account_id, api_key_prefix)
+                self.mark_failure(account_index, error_type="timeout", error_message=error_msg)
+            
+            except httpx.TransportError as e:
+                error_msg = f"Connection error for account {account_id}: {str(e)}"
+                log_error(error_msg, account_id, api_key_prefix)
+                self.mark_failure(account_index, error_type="connection", error_message=error_msg)
                 
-                time.sleep(backoff_time)
+                # Connection errors might be temporary network issues
+                # Use a shorter backoff
+                await asyncio.sleep(BACKOFF_BASE)
+            
+            except Exception as e:
+                error_msg = f"Exception for account {account_id}: {str(e)}"
+                log_error(error_msg, account_id, api_key_prefix)
+                self.mark_failure(account_index, error_type="unknown", error_message=error_msg)
+            
+            # Switch to the next account on failure - use smart selection
+            self.switch_account()
+            retries += 1
+            
+            # Back off without blocking other calls sharing the event loop
+            if retries < RETRY_LIMIT:
+                await asyncio.sleep(self._backoff_time(retries))
 
         # All retries failed
-        elapsed = time.time() - start_time
-        log_error(f"All API accounts failed after {elapsed:.2f}s and {retries} retries")
-        return {"error": "All API accounts failed", "retry_after": 60, "accounts_tried": list(tried_accounts)}
+        return self._all_failed(start_time, retries, tried_mask)
+    
+    def close(self):
+        """Close the pooled HTTP session"""
+        self.session.close()
+    
+    async def aclose(self):
+        """Close the pooled HTTP sessions, including the async one"""
+        if self._save_task is not None:
+            await self._save_task
+        if self._async_client is not None and not self._async_client.is_closed:
+            await self._async_client.aclose()
+        self.close()
 
 # Example usage:
 if __name__ == "__main__":
@@ -3,13 +3,15 @@
 import json
 import random
 import time
-from datetime import datetime
-import sys
-import os
-sys.path.append(os.path.abspath("/Users/momo/Desktop/x"))
+import asyncio
+from collections import OrderedDict, deque
+from itertools import islice
+from functools import lru_cache
+from types import MappingProxyType
 
-from autox_ai.api_manager import AutoXAIManager
-from autox_ai.logger import log_error
+from autox_ai.api_manager import get_ai_manager
+from autox_ai.config import BACKOFF_BASE
+from autox_ai.logger import log_error, log_warning
 from storagex.storage_manager import store_file_data, read_file_data
 from storagex.database import store_memory, fetch_recent_memory
 from storagex.faiss_manager import add_faiss_embedding, search_faiss_embedding
@@ -17,18 +19,84 @@ from storagex.faiss_manager import add_faiss_embedding, search_faiss_embedding
 # Constants
 DECISION_THRESHOLD = 0.75  # Confidence threshold for making decisions
 CONTEXT_WINDOW = 5  # Number of recent events to consider for context
+CONTEXT_HISTORY_SIZE = 100  # Most context entries kept; older ones are dropped as new ones arrive
 MAX_RETRY_ATTEMPTS = 3  # Maximum number of retry attempts for API calls
+DECISION_CACHE_SIZE = 1024  # Maximum cached decisions kept
+DECISION_CACHE_TTL = 300  # Seconds a cached decision stays valid
+
+try:
+    import orjson
+except ImportError:
+    # orjson not available, fall back to the slower stdlib json
+    orjson = None
+
+if orjson is not None:
+    def _json_dumps(obj):
+        # Trigger data may carry non-string keys, which the stdlib json coerces too
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+    _json_loads = json.loads
+
+# orjson has no raw_decode(), so locating a JSON object inside free text stays on the stdlib
+_JSON_DECODER = json.JSONDecoder()
+
+def _fallback_reply(app_id, trigger_data):
+    return {
+        "action": "reply",
+        "app_id": app_id,
+        "data": {
+            "message": "I received your message and will process it soon.",
+            "chat_id": trigger_data.get("chat_id")
+        }
+    }
+
+def _fallback_click(app_id, trigger_data):
+    return {
+        "action": "click",
+        "app_id": app_id,
+        "data": {
+            "element_id": trigger_data.get("notification_id")
+        }
+    }
+
+def _fallback_observe(app_id, trigger_data):
+    return {
+        "action": "observe",
+        "app_id": app_id,
+        "data": {
+            "element_id": trigger_data.get("element_id")
+        }
+    }
+
+@lru_cache(maxsize=256)
+def _prompt_templates(app_id, trigger_type):
+    """Return the system message and user message prefix for an (app, trigger type) pair.
+    
+    Only the strings are cached; each prompt still gets its own message dicts.
+    """
+    system_content = f"You are AutoX AI, the intelligent automation brain for ZealX. Your role is to process user interactions, make automation decisions, and send structured execution commands. You are currently processing a {trigger_type} from {app_id}."
+    user_prefix = f"I received a {trigger_type} from {app_id} with the following data: "
+    return system_content, user_prefix
+
+# Trigger type -> rule-based fallback task builder; other types get a "log" task
+_FALLBACK_BUILDERS = MappingProxyType({
+    "message": _fallback_reply,
+    "notification": _fallback_click,
+    "ui_change": _fallback_observe,
+})
 
 class AutoXAI:
     """Intelligent automation brain for ZealX, processes triggers and makes decisions."""
     
     def __init__(self):
         """Initialize AutoX AI with API manager."""
-        self.api_manager = AutoXAIManager()
-        self.context_history = []
-        self.decision_cache = {}  # Cache for similar decisions to reduce API calls
+        self.api_manager = get_ai_manager()
+        self.context_history = deque(maxlen=CONTEXT_HISTORY_SIZE)
+        self.decision_cache = OrderedDict()  # key -> (stored_at, task), oldest first; reduces API calls for similar triggers
         self.last_api_call = None
-        self.retry_count = 0
     
     def process_trigger(self, app_id, trigger_type, trigger_data):
         """Process a trigger from an app and decide on the appropriate action.
@@ -46,11 +114,9 @@ class AutoXAI:
         
         # Check if we have a cached decision for similar triggers
         cache_key = self._generate_cache_key(app_id, trigger_type, trigger_data)
-        if cache_key in self.decision_cache:
-            cached_task = self.decision_cache[cache_key]
-            # Check if cache is still valid (not expired)
-            if datetime.now().timestamp() - cached_task.get('timestamp', 0) < 300:  # 5 minutes
-                return cached_task.get('task')
+        cached_task = self._cache_get(cache_key)
+        if cached_task is not None:
+            return cached_task
         
         # Get recent context for decision making
         context = self._get_recent_context()
@@ -60,13 +126,54 @@ class AutoXAI:
         
         # Cache the decision for future similar triggers
         if task:
-            self.decision_cache[cache_key] = {
-                'task': task,
-                'timestamp': datetime.now().timestamp()
-            }
+            self._cache_put(cache_key, task)
+        
+        return task
+    
+    async def aprocess_trigger(self, app_id, trigger_type, trigger_data):
+        """Async variant of process_trigger() that waits on the AI call without blocking the event loop.
+        
+        Args:
+            app_id (str): Identifier for the app
+            trigger_type (str): Type of trigger (notification, message, ui_change, etc.)
+            trigger_data (dict): Data associated with the trigger
+            
+        Returns:
+            dict: Task to execute
+        """
+        self.add_to_context(app_id, trigger_type, trigger_data)
+        
+        cache_key = self._generate_cache_key(app_id, trigger_type, trigger_data)
+        cached_task = self._cache_get(cache_key)
+        if cached_task is not None:
+            return cached_task
+        
+        context = self._get_recent_context()
+        task = await self._agenerate_task_with_ai(app_id, trigger_type, trigger_data, context)
+        
+        if task:
+            self._cache_put(cache_key, task)
         
         return task
     
+    def _cache_get(self, key):
+        """Return a cached decision that is still fresh, or None"""
+        entry = self.decision_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= DECISION_CACHE_TTL:
+            del self.decision_cache[key]
+            return None
+        self.decision_cache.move_to_end(key)
+        return entry[1]
+    
+    def _cache_put(self, key, task):
+        """Store a decision, evicting the least recently used one when full"""
+        self.decision_cache[key] = (time.monotonic(), task)
+        self.decision_cache.move_to_end(key)
+        if len(self.decision_cache) > DECISION_CACHE_SIZE:
+            self.decision_cache.popitem(last=False)
+    
     def add_to_context(self, app_id, trigger_type, trigger_data):
         """Add a trigger to the context history.
         
@@ -79,14 +186,17 @@ class AutoXAI:
             'app_id': app_id,
             'trigger_type': trigger_type,
             'trigger_data': trigger_data,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': round(time.time())  # Unix time in seconds; entries are rendered into the prompt
         }
         
-        self.context_history.append(context_entry)
+        # Serialize once here; every later prompt that includes this entry reuses the string
+        try:
+            context_entry['_json'] = _json_dumps(context_entry)
+        except (TypeError, ValueError) as e:
+            log_warning(f"Context entry for {app_id} is not JSON serializable: {str(e)}")
         
-        # Limit context history size
-        if len(self.context_history) > 100:  # Keep last 100 entries
-            self.context_history = self.context_history[-100:]
+        # The deque drops the oldest entry once it holds CONTEXT_HISTORY_SIZE
+        self.context_history.append(context_entry)
     
     def _get_recent_context(self):
         """Get recent context for decision making.
@@ -95,7 +205,7 @@ class AutoXAI:
             list: Recent context entries
         """
         # Get the most recent entries
-        recent_context = self.context_history[-CONTEXT_WINDOW:] if len(self.context_history) > CONTEXT_WINDOW else self.context_history
+        recent_context = list(islice(reversed(self.context_history), CONTEXT_WINDOW))[::-1]
         
         # Also fetch recent memories from storage for additional context
         try:
@@ -105,7 +215,7 @@ class AutoXAI:
             for memory in recent_memories:
                 try:
                     # Memories are stored as JSON strings
-                    memory_data = json.loads(memory['text'])
+                    memory_data = _json_loads(memory['text'])
                     memory_context.append(memory_data)
                 except json.JSONDecodeError:
                     # If not JSON, add as raw text
@@ -130,33 +240,64 @@ class AutoXAI:
         Returns:
             dict: Task to execute
         """
+        # Prepare input for AI model once; every attempt sends the same prompt
         try:
-            # Prepare input for AI model
             prompt = self._prepare_ai_prompt(app_id, trigger_type, trigger_data, context)
-            
-            # Call AI model through API manager
-            model = "@cf/meta/mistral-7b-instruct"  # Default model
-            response = self.api_manager.run(model, prompt)
-            
-            # Parse AI response into a task
-            task = self._parse_ai_response(response, app_id)
-            
-            # Reset retry count on success
-            self.retry_count = 0
-            self.last_api_call = datetime.now().timestamp()
-            
-            return task
         except Exception as e:
-            log_error(f"Error generating task with AI: {str(e)}")
-            
-            # Implement retry logic
-            if self.retry_count < MAX_RETRY_ATTEMPTS:
-                self.retry_count += 1
-                time.sleep(1)  # Wait before retry
-                return self._generate_task_with_ai(app_id, trigger_type, trigger_data, context)
+            log_error(f"Error preparing AI prompt: {str(e)}")
+            return self._fallback_rule_based_task(app_id, trigger_type, trigger_data)
+        model = "@cf/meta/mistral-7b-instruct"  # Default model
+        
+        for attempt in range(MAX_RETRY_ATTEMPTS + 1):
+            try:
+                # Call AI model through API manager
+                response = self.api_manager.run(model, prompt)
+                
+                # Parse AI response into a task
+                task = self._parse_ai_response(response, app_id)
+                self.last_api_call = time.monotonic()
+                return task
+            except Exception as e:
+                log_error(f"Error generating task with AI: {str(e)}")
+                if attempt < MAX_RETRY_ATTEMPTS:
+                    time.sleep(BACKOFF_BASE * 2 ** attempt)  # Wait before retry
+        
+        # If all retries fail, fall back to rule-based approach
+        return self._fallback_rule_based_task(app_id, trigger_type, trigger_data)
+    
+    async def _agenerate_task_with_ai(self, app_id, trigger_type, trigger_data, context):
+        """Async variant of _generate_task_with_ai() with exponential backoff between attempts.
+        
+        Args:
+            app_id (str): Identifier for the app
+            trigger_type (str): Type of trigger
+            trigger_data (dict): Data associated with the trigger
+            context (list): Recent context for decision making
             
-            # If all retries fail, fall back to rule-based approach
+        Returns:
+            dict: Task to execute
+        """
+        try:
+            prompt = self._prepare_ai_prompt(app_id, trigger_type, trigger_data, context)
+        except Exception as e:
+            log_error(f"Error preparing AI prompt: {str(e)}")
             return self._fallback_rule_based_task(app_id, trigger_type, trigger_data)
+        model = "@cf/meta/mistral-7b-instruct"  # Default model
+        
+        for attempt in range(MAX_RETRY_ATTEMPTS + 1):
+            try:
+                response = await self.api_manager.arun_threadsafe(model, prompt)
+                task = self._parse_ai_response(response, app_id)
+                self.last_api_call = time.monotonic()
+                return task
+            except Exception as e:
+                log_error(f"Error generating task with AI: {str(e)}")
+                if attempt < MAX_RETRY_ATTEMPTS:
+                    # Wait before retry without holding up other triggers
+                    await asyncio.sleep(BACKOFF_BASE * 2 ** attempt)
+        
+        # If all retries fail, fall back to rule-based approach
+        return self._fallback_rule_based_task(app_id, trigger_type, trigger_data)
     
     def _prepare_ai_prompt(self, app_id, trigger_type, trigger_data, context):
         """Prepare a prompt for the AI model.
@@ -174,20 +315,21 @@ class AutoXAI:
         formatted_context = []
         for ctx in context:
             if isinstance(ctx, dict):
-                formatted_context.append(json.dumps(ctx))
+                formatted_context.append(ctx.get('_json') or _json_dumps(ctx))
             else:
                 formatted_context.append(str(ctx))
         
         # Create a structured prompt for the AI
+        system_content, user_prefix = _prompt_templates(app_id, trigger_type)
         prompt = {
             "messages": [
                 {
                     "role": "system",
-                    "content": f"You are AutoX AI, the intelligent automation brain for ZealX. Your role is to process user interactions, make automation decisions, and send structured execution commands. You are currently processing a {trigger_type} from {app_id}."
+                    "content": system_content
                 },
                 {
                     "role": "user",
-                    "content": f"I received a {trigger_type} from {app_id} with the following data: {json.dumps(trigger_data)}. Recent context: {formatted_context}. Please generate a structured task command to handle this trigger appropriately."
+                    "content": f"{user_prefix}{_json_dumps(trigger_data)}. Recent context: {formatted_context}. Please generate a structured task command to handle this trigger appropriately."
                 }
             ]
         }
@@ -211,13 +353,11 @@ class AutoXAI:
                 task_data = response
             else:
                 # Try to extract JSON from text response
-                # Look for JSON-like structure in the response
+                # Decode the first JSON object in the response; the decoder finds where it ends
                 start_idx = response.find('{')
-                end_idx = response.rfind('}')
                 
-                if start_idx >= 0 and end_idx > start_idx:
-                    json_str = response[start_idx:end_idx+1]
-                    task_data = json.loads(json_str)
+                if start_idx >= 0:
+                    task_data, _ = _JSON_DECODER.raw_decode(response, start_idx)
                 else:
                     # If no JSON found, create a simple task based on text
                     task_data = {
@@ -264,39 +404,16 @@ class AutoXAI:
             dict: Task to execute
         """
         # Simple rule-based fallback logic
-        if trigger_type == "message":
-            return {
-                "action": "reply",
-                "app_id": app_id,
-                "data": {
-                    "message": "I received your message and will process it soon.",
-                    "chat_id": trigger_data.get("chat_id")
-                }
-            }
-        elif trigger_type == "notification":
-            return {
-                "action": "click",
-                "app_id": app_id,
-                "data": {
-                    "element_id": trigger_data.get("notification_id")
-                }
-            }
-        elif trigger_type == "ui_change":
-            return {
-                "action": "observe",
-                "app_id": app_id,
-                "data": {
-                    "element_id": trigger_data.get("element_id")
-                }
-            }
-        else:
-            return {
-                "action": "log",
-                "app_id": app_id,
-                "data": {
-                    "message": f"Received {trigger_type} but no specific action defined."
-                }
+        builder = _FALLBACK_BUILDERS.get(trigger_type)
+        if builder is not None:
+            return builder(app_id, trigger_data)
+        return {
+            "action": "log",
+            "app_id": app_id,
+            "data": {
+                "message": f"Received {trigger_type} but no specific action defined."
             }
+        }
     
     def _generate_cache_key(self, app_id, trigger_type, trigger_data):
         """Generate a cache key for similar triggers.
@@ -307,27 +424,19 @@ class AutoXAI:
             trigger_data (dict): Data associated with the trigger
             
         Returns:
-            str: Cache key
+            tuple: Cache key
         """
-        # Create a simplified version of trigger_data for the cache key
-        # This helps match similar but not identical triggers
-        simplified_data = {}
-        
+        # Key on a simplified version of trigger_data so similar but not identical
+        # triggers match; a tuple hashes its few parts directly, with no string building
         if trigger_type == "message" and "text" in trigger_data:
-            # For messages, use first few words as key
-            text = trigger_data["text"]
-            words = text.split()[:5]  # First 5 words
-            simplified_data["text_prefix"] = " ".join(words)
+            # For messages, use first few words as key; maxsplit stops scanning after them
+            words = trigger_data["text"].split(None, 5)[:5]
+            return (app_id, trigger_type, "text_prefix", tuple(words))
         elif "id" in trigger_data:
             # For triggers with IDs, use the ID
-            simplified_data["id"] = trigger_data["id"]
-        
-        # Create a string key
-        key_parts = [app_id, trigger_type]
-        for k, v in simplified_data.items():
-            key_parts.append(f"{k}:{v}")
+            return (app_id, trigger_type, "id", trigger_data["id"])
         
-        return "|".join(key_parts)
+        return (app_id, trigger_type)
 
 # Example usage
 if __name__ == "__main__":
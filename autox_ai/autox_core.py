@@ -3,12 +3,34 @@
 import os
 import json
 import time
+import queue
+import asyncio
 import threading
 from datetime import datetime
-import sys
-sys.path.append(os.path.abspath("/Users/momo/Desktop/x"))
+import numpy as np
 
-from autox_ai.api_manager import AutoXAIManager
+try:
+    import orjson
+except ImportError:
+    # orjson not available, fall back to the slower stdlib json
+    orjson = None
+
+if orjson is not None:
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+    _json_loads = orjson.loads
+    def _dump_config(obj):
+        """Serialize a config file body as indented JSON bytes."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+else:
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+    _json_loads = json.loads
+    def _dump_config(obj):
+        """Serialize a config file body as indented JSON bytes."""
+        return json.dumps(obj, indent=2).encode()
+
+from autox_ai.api_manager import get_ai_manager
 from autox_ai.logger import log_error
 from autox_ai.autox_ai import AutoXAI
 from storagex.storage_manager import store_file_data, read_file_data
@@ -18,6 +40,8 @@ from storagex.storagex import StorageX
 # Constants
 AUTOMATION_DIR = "automation_files"
 USER_CONFIG_FILE = "user_config.json"
+EVENT_WAIT_TIMEOUT = 0.5  # Seconds an idle event loop waits before re-checking self.running
+MEMORY_BATCH_SIZE = 64  # Task memories buffered before they are stored in one batch
 
 # Ensure automation directory exists
 os.makedirs(AUTOMATION_DIR, exist_ok=True)
@@ -34,14 +58,17 @@ class AutoX:
         """
         self.user_id = user_id
         self.is_premium = is_premium
-        self.ai_manager = AutoXAIManager()
+        self.ai_manager = get_ai_manager()
         self.autox_ai = AutoXAI()  # Initialize AutoX AI for decision-making
         self.storage = StorageX()  # Initialize StorageX for efficient data storage
         self.active_apps = []
         self.event_listeners = {}
         self.running = False
-        self.event_queue = []
-        self.lock = threading.Lock()
+        self.event_queue = queue.Queue()
+        self._rng = np.random.default_rng()  # Source of placeholder task embeddings
+        self._pending_memories = []  # (task_json, embedding) waiting for flush_memories()
+        self._memory_lock = threading.Lock()
+        self._last_config_bytes = None  # Serialized settings last read or written; unchanged saves are skipped
         
         # Load user configuration
         self.load_user_config()
@@ -50,17 +77,26 @@ class AutoX:
         """Load user configuration from storage."""
         config_path = os.path.join(AUTOMATION_DIR, f"{self.user_id}_{USER_CONFIG_FILE}")
         
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+        try:
+            with open(config_path, 'rb') as f:
+                config = _json_loads(f.read())
                 self.active_apps = config.get('active_apps', [])
                 self.is_premium = config.get('is_premium', self.is_premium)
-        else:
+            self._last_config_bytes = self._config_bytes()
+        except FileNotFoundError:
             # Create default config
             self.save_user_config()
     
+    def _config_bytes(self):
+        """Serialize the persisted settings, leaving out the last_updated stamp."""
+        return _json_dumps([self.user_id, self.is_premium, self.active_apps])
+    
     def save_user_config(self):
-        """Save user configuration to storage."""
+        """Save user configuration to storage, skipping the write when nothing changed."""
+        config_bytes = self._config_bytes()
+        if config_bytes == self._last_config_bytes:
+            return
+        
         config = {
             'user_id': self.user_id,
             'is_premium': self.is_premium,
@@ -68,9 +104,13 @@ class AutoX:
             'last_updated': datetime.now().isoformat()
         }
         
+        # Write to a temporary file and swap it in, so a crash mid-write never corrupts the config
         config_path = os.path.join(AUTOMATION_DIR, f"{self.user_id}_{USER_CONFIG_FILE}")
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
+        tmp_path = config_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_dump_config(config))
+        os.replace(tmp_path, config_path)
+        self._last_config_bytes = config_bytes
     
     def add_app(self, app_id):
         """Add an app to the active apps list.
@@ -129,18 +169,19 @@ class AutoX:
             app_dir = os.path.join(AUTOMATION_DIR, app_id)
             os.makedirs(app_dir, exist_ok=True)
             
-            # Create a placeholder automation file
+            # Create a placeholder automation file; exclusive mode leaves an existing one untouched
             automation_file = os.path.join(app_dir, "automation.json")
-            if not os.path.exists(automation_file):
-                default_automation = {
-                    "app_id": app_id,
-                    "events": ["notification", "message", "ui_change"],
-                    "actions": ["reply", "click", "swipe", "type"],
-                    "last_updated": datetime.now().isoformat()
-                }
-                
-                with open(automation_file, 'w') as f:
-                    json.dump(default_automation, f, indent=2)
+            try:
+                with open(automation_file, 'xb') as f:
+                    default_automation = {
+                        "app_id": app_id,
+                        "events": ["notification", "message", "ui_change"],
+                        "actions": ["reply", "click", "swipe", "type"],
+                        "last_updated": datetime.now().isoformat()
+                    }
+                    f.write(_dump_config(default_automation))
+            except FileExistsError:
+                pass
             
             return True
         except Exception as e:
@@ -171,24 +212,38 @@ class AutoX:
             event_type (str): Type of event
             event_data (dict): Data associated with the event
         """
-        # Add event to queue for processing
-        with self.lock:
-            self.event_queue.append({
-                "app_id": app_id,
-                "event_type": event_type,
-                "event_data": event_data,
-                "timestamp": datetime.now().isoformat()
-            })
+        # Add event to queue for processing; wakes process_events immediately
+        self.event_queue.put({
+            "app_id": app_id,
+            "event_type": event_type,
+            "event_data": event_data,
+            "timestamp": time.time_ns()  # Unix time in nanoseconds
+        })
     
     def process_events(self):
         """Process events in the queue."""
+        # Tasks for each batch of events are generated concurrently on this thread's own loop
+        loop = asyncio.new_event_loop()
+        try:
+            self._process_events(loop)
+        finally:
+            loop.close()
+    
+    def _process_events(self, loop):
+        """Event loop body for process_events(), running AI calls on the given asyncio loop."""
         while self.running:
-            # Get events from queue
-            events_to_process = []
-            with self.lock:
-                if self.event_queue:
-                    events_to_process = self.event_queue.copy()
-                    self.event_queue = []
+            # Block until an event arrives, then take everything queued behind it
+            try:
+                events_to_process = [self.event_queue.get(timeout=EVENT_WAIT_TIMEOUT)]
+            except queue.Empty:
+                # Idle: store whatever task memories have built up
+                self.flush_memories()
+                continue
+            while True:
+                try:
+                    events_to_process.append(self.event_queue.get_nowait())
+                except queue.Empty:
+                    break
             
             # Process each event
             for event in events_to_process:
@@ -203,12 +258,19 @@ class AutoX:
                             callback(event_data)
                         except Exception as e:
                             log_error(f"Error in event callback: {str(e)}", self.user_id)
-                
-                # Generate and execute task based on event
-                self.generate_task(app_id, event_type, event_data)
             
-            # Sleep to prevent high CPU usage
-            time.sleep(0.1)
+            # Generate and execute tasks for the whole batch concurrently
+            loop.run_until_complete(self._agenerate_tasks(events_to_process))
+    
+    async def _agenerate_tasks(self, events):
+        """Generate tasks for a batch of events concurrently."""
+        results = await asyncio.gather(
+            *(self.agenerate_task(event["app_id"], event["event_type"], event["event_data"]) for event in events),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                log_error(f"Error generating task: {str(result)}", self.user_id)
     
     def generate_task(self, app_id, event_type, event_data):
         """Generate a task based on an event using AutoX AI.
@@ -223,23 +285,58 @@ class AutoX:
         """
         # Use AutoX AI to generate an intelligent task based on the event
         task = self.autox_ai.process_trigger(app_id, event_type, event_data)
+        self._handle_task(task)
+        return task
+    
+    async def agenerate_task(self, app_id, event_type, event_data):
+        """Async variant of generate_task() that waits on the AI call without blocking the event loop.
         
+        Args:
+            app_id (str): Identifier for the app
+            event_type (str): Type of event
+            event_data (dict): Data associated with the event
+            
+        Returns:
+            dict: Task to execute
+        """
+        task = await self.autox_ai.aprocess_trigger(app_id, event_type, event_data)
+        self._handle_task(task)
+        return task
+    
+    def _handle_task(self, task):
+        """Execute a generated task and buffer it as a memory."""
         # If we generated a task, execute it
         if task:
             self.execute_task(task)
             
             # Store task in memory for learning with proper embedding
             # Convert task to JSON string for storage
-            task_json = json.dumps(task)
+            task_json = _json_dumps(task)
             
             # In a real implementation, we would generate a proper embedding
             # For now, we'll use a random embedding as a placeholder
-            embedding = np.random.rand(512).astype('float32').tolist()
+            embedding = self._rng.random(512, dtype=np.float32)
             
-            # Store in StorageX for efficient retrieval
-            self.storage.store_memory_with_embedding(task_json, embedding)
+            # Buffer for StorageX; memories are stored in batches for efficient retrieval
+            with self._memory_lock:
+                self._pending_memories.append((task_json, embedding))
+                batch_full = len(self._pending_memories) >= MEMORY_BATCH_SIZE
+            if batch_full:
+                self.flush_memories()
+    
+    def flush_memories(self):
+        """Store all buffered task memories in StorageX as one batch."""
+        with self._memory_lock:
+            pending, self._pending_memories = self._pending_memories, []
+        if not pending:
+            return
         
-        return task
+        texts = [text for text, _ in pending]
+        embeddings = np.stack([embedding for _, embedding in pending])
+        try:
+            self.storage.store_memories_with_embeddings(texts, embeddings)
+        except Exception as e:
+            log_error(f"Failed to store task memories: {str(e)}", self.user_id)
     
     def execute_task(self, task):
         """Execute a task.
@@ -292,6 +389,9 @@ class AutoX:
             if hasattr(self, 'event_thread') and self.event_thread.is_alive():
                 self.event_thread.join(timeout=1.0)
             
+            # Store memories still buffered from the last events
+            self.flush_memories()
+            
             print(f"AutoX stopped for user {self.user_id}")
 
 # Example usage
@@ -23,3 +23,27 @@ USAGE_WARNING_THRESHOLD = 0.8  # Warn when 80% of daily limit is reached
 
 # Performance Optimization
 BACKOFF_BASE = 0.1  # Base time for exponential backoff
+
+# Async Concurrency Control (AIMD per account)
+AIMD_INITIAL_CONCURRENCY = 4  # In-flight async requests allowed per account at start
+AIMD_MAX_CONCURRENCY = 16  # Upper bound for the per-account concurrency cap
+AIMD_INCREASE_AFTER = 10  # Consecutive successes before the cap grows by one
+AIMD_LATENCY_WINDOW = 20  # Number of recent request latencies to track
+AIMD_LATENCY_TARGET = 5.0  # Seconds; a slower rolling mean also shrinks the cap
+RATE_LIMIT_REMAINING_THRESHOLD = 2  # Rest an account early when the server reports this few requests left
+
+# Response Cache
+RESPONSE_CACHE_SIZE = 1024  # Maximum number of cached successful responses
+RESPONSE_CACHE_TTL = 300  # Seconds a cached response stays valid
+
+# Circuit Breaker (per account)
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open an account's circuit
+BREAKER_TIMEOUT = 60  # Seconds an open circuit waits before allowing a probe request
+BREAKER_MAX_TIMEOUT = 900  # Upper bound for the doubled timeout after failed probes
+
+# Logging
+LOG_SAMPLE_PER_MINUTE = 5  # Log messages kept per account per minute; the rest are counted
+ERROR_BODY_LOG_LIMIT = 512  # Characters of an error response body included in log messages
+
+# Metrics
+METRICS_RING_SIZE = 256  # Recent request latencies kept per account for percentiles
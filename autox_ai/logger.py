@@ -2,14 +2,112 @@
 
 import os
 import json
-from datetime import datetime, date
+import atexit
+import queue
+import threading
+from datetime import datetime, date, timedelta
+
+try:
+    import orjson
+except ImportError:
+    # orjson not available, fall back to the slower stdlib json
+    orjson = None
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+    _json_loads = json.loads
 
 LOG_DIR = "storagex_data"
-LOG_FILE = os.path.join(LOG_DIR, f"autox_logs_{datetime.now().strftime('%Y%m%d')}.json")
+LOG_FILE = os.path.join(LOG_DIR, f"autox_logs_{datetime.now().strftime('%Y%m%d')}.ndjson")  # One JSON entry per line
 USAGE_FILE = os.path.join(LOG_DIR, f"usage_logs_{datetime.now().strftime('%Y%m%d')}.json")
 
+LOG_BATCH_SIZE = 256  # Most entries written by a single flush
+
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Entries waiting to be written as (path, entry); callers only enqueue, the writer thread does the I/O
+_log_queue = queue.Queue()
+_open_files = {}  # path -> append handle kept open between batches, used only by the writer thread
+
+def _get_file(path):
+    """Return the open append handle for path, opening it on first use"""
+    f = _open_files.get(path)
+    if f is None or f.closed:
+        f = _open_files[path] = open(path, 'ab')
+    return f
+
+def _close_files():
+    """Close every kept-open log handle"""
+    for f in _open_files.values():
+        f.close()
+    _open_files.clear()
+
+def _write_pending(first=None):
+    """Write every queued entry, after first if given, one writelines() call per target file"""
+    while True:
+        by_path = {}
+        taken = 0
+        for _ in range(LOG_BATCH_SIZE):
+            if first is not None:
+                (path, log_entry), first = first, None
+            else:
+                try:
+                    path, log_entry = _log_queue.get_nowait()
+                except queue.Empty:
+                    break
+            taken += 1
+            try:
+                line = _json_dumps(log_entry) + b'\n'
+            except Exception as e:
+                # Skip only the entry that cannot be encoded, not the rest of the batch
+                print(f"Error encoding log entry: {str(e)}")
+                continue
+            by_path.setdefault(path, []).append(line)
+        if not taken:
+            return
+        try:
+            for path, lines in by_path.items():
+                f = _get_file(path)
+                try:
+                    f.writelines(lines)
+                    f.flush()  # Readers such as get_recent_errors() see each batch once written
+                except Exception:
+                    # Reopen on the next batch rather than keep writing to a broken handle
+                    del _open_files[path]
+                    f.close()
+                    raise
+        finally:
+            for _ in range(taken):
+                _log_queue.task_done()
+
+def _drain():
+    """Writer thread: wait for the first pending entry, then write it with everything queued behind it"""
+    while True:
+        item = _log_queue.get()
+        try:
+            _write_pending(item)
+        except Exception as e:
+            print(f"Error writing logs: {str(e)}")
+
+def _flush():
+    """Wait until the writer thread has written every queued entry
+    
+    Only the writer thread writes, so entries land in the order they were queued.
+    """
+    _log_queue.join()
+
+def _append_entry(log_entry):
+    """Queue one entry to be appended to the log file as a single JSON line"""
+    _log_queue.put((LOG_FILE, log_entry))
+
+threading.Thread(target=_drain, name="autox-log-writer", daemon=True).start()
+atexit.register(_close_files)  # atexit runs last-registered first, so this follows _flush
+atexit.register(_flush)
+
 def log_error(error_message, account_id=None, api_key_prefix=None, status_code=None):
     """
     Log API errors with detailed information for better debugging and monitoring.
@@ -33,22 +131,7 @@ def log_error(error_message, account_id=None, api_key_prefix=None, status_code=N
         "status_code": status_code
     }
     
-    # Load existing logs if file exists
-    logs = []
-    if os.path.exists(LOG_FILE):
-        try:
-            with open(LOG_FILE, 'r') as f:
-                logs = json.load(f)
-        except json.JSONDecodeError:
-            # Handle corrupted log file
-            pass
-    
-    # Append new log entry
-    logs.append(log_entry)
-    
-    # Write updated logs
-    with open(LOG_FILE, 'w') as f:
-        json.dump(logs, f, indent=2)
+    _append_entry(log_entry)
     
     return log_entry
 
@@ -75,22 +158,7 @@ def log_warning(warning_message, account_id=None, api_key_prefix=None, details=N
         "details": details
     }
     
-    # Load existing logs if file exists
-    logs = []
-    if os.path.exists(LOG_FILE):
-        try:
-            with open(LOG_FILE, 'r') as f:
-                logs = json.load(f)
-        except json.JSONDecodeError:
-            # Handle corrupted log file
-            pass
-    
-    # Append new log entry
-    logs.append(log_entry)
-    
-    # Write updated logs
-    with open(LOG_FILE, 'w') as f:
-        json.dump(logs, f, indent=2)
+    _append_entry(log_entry)
     
     return log_entry
 
@@ -104,18 +172,25 @@ def get_recent_errors(hours=24):
     Returns:
         list: List of recent error log entries
     """
-    if not os.path.exists(LOG_FILE):
-        return []
+    _flush()  # Include entries still waiting in the queue
     
     try:
-        with open(LOG_FILE, 'r') as f:
-            logs = json.load(f)
+        cutoff_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+        recent_errors = []
         
-        # Filter logs by time
-        cutoff_time = (datetime.now() - datetime.timedelta(hours=hours)).isoformat()
-        recent_errors = [log for log in logs if log["type"] == "error" and log["timestamp"] >= cutoff_time]
+        # Stream the file a line at a time, skipping lines left incomplete by a crash
+        with open(LOG_FILE, 'rb') as f:
+            for line in f:
+                try:
+                    log = _json_loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if log["type"] == "error" and log["timestamp"] >= cutoff_time:
+                    recent_errors.append(log)
         
         return recent_errors
+    except FileNotFoundError:
+        return []
     except Exception as e:
         print(f"Error reading logs: {str(e)}")
         return []
\ No newline at end of file
@@ -1,20 +1,19 @@
 # app.py - Main FastAPI application for ZealX Backend
 
-import os
-import sys
 import time
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import logging
 from logging.config import dictConfig
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import redis.asyncio as redis
 import asyncio
-
-# Add project root to path
-sys.path.append(os.path.abspath("/Users/momo/Desktop/x"))
+import orjson
+from collections import defaultdict
 
 # Import ZealX components
 from zealx import ZealX
@@ -24,12 +23,12 @@ from autox_ai.autox_ai import AutoXAI
 from autox_ai.adx_enhanced import ADXEnhanced
 
 # Import backend components
-from backend.core.config import Settings
+from backend.core.config import settings
 from backend.core.logging_manager import logging_manager
 from backend.core.firelayers import fire_layers
 from backend.middleware.api_account_manager import APIAccountManager
 from backend.middleware.error_handlers import setup_error_handlers
-from backend.middleware.security import setup_security_middleware
+from backend.middleware.security import setup_security_middleware, FASTPATH_PATHS
 from backend.routers import api_router
 
 # Configure logging
@@ -66,21 +65,20 @@ logging_config = {
 dictConfig(logging_config)
 logger = logging.getLogger(__name__)
 
+BACKGROUND_TASK_SHUTDOWN_TIMEOUT = 5.0  # Seconds to wait for cancelled background tasks on shutdown
+
 # Initialize components on startup and shutdown on app termination
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load settings
-    settings = Settings()
+    # Expose the cached settings
     app.state.settings = settings
     
-    # Initialize Redis
-    logger.info("Connecting to Redis...")
-    redis_client = redis.from_url(settings.redis_url)
+    # Share the Redis client (and its connection pool) set up for the security middleware
     app.state.redis = redis_client
     
     # Initialize API Account Manager
     logger.info("Initializing API Account Manager...")
-    api_manager = APIAccountManager(redis_client, settings)
+    api_manager = APIAccountManager(settings, redis_client)
     await api_manager.initialize()
     app.state.api_manager = api_manager
     
@@ -95,7 +93,8 @@ async def lifespan(app: FastAPI):
     
     # Initialize other components
     logger.info("Initializing ZealX Backend components...")
-    app.state.zealx_instances = {}
+    app.state.zealx_instances = {}  # Per worker process; users are not shared across workers
+    app.state.zealx_locks = defaultdict(asyncio.Lock)  # Per-user guard for instance creation
     
     # Start background tasks
     logger.info("Starting background tasks...")
@@ -114,54 +113,93 @@ async def lifespan(app: FastAPI):
     for task in app.state.background_tasks:
         task.cancel()
     
-    # Wait for tasks to complete
-    await asyncio.gather(*app.state.background_tasks, return_exceptions=True)
+    # Wait for tasks to complete, without letting a stuck task hang shutdown
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*app.state.background_tasks, return_exceptions=True),
+            timeout=BACKGROUND_TASK_SHUTDOWN_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Background tasks did not finish within {BACKGROUND_TASK_SHUTDOWN_TIMEOUT} seconds")
     
     # Close API Account Manager
     await api_manager.close()
     
-    # Close Redis connection
+    # Close Redis connections
     await redis_client.close()
+    await redis_pool.disconnect()
     
     # Close logging manager
     logging_manager.close()
     
-    # Shutdown all active ZealX instances
-    for user_id, zealx in app.state.zealx_instances.items():
-        zealx.stop()
+    # Shutdown all active ZealX instances in parallel; stop() blocks, so each runs in a thread
+    instances = list(app.state.zealx_instances.items())
+    app.state.zealx_instances.clear()
+    results = await asyncio.gather(
+        *(asyncio.to_thread(zealx.stop) for _, zealx in instances),
+        return_exceptions=True,
+    )
+    for (user_id, _), result in zip(instances, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error stopping ZealX for user {user_id}: {result}")
     
     logger.info("ZealX Backend shutdown complete")
 
-# Create FastAPI app with lifespan management
+# Create FastAPI app with lifespan management; API docs are only served in debug mode
+_debug = settings.debug
 app = FastAPI(
     title="ZealX API",
     description="AI-powered digital twin and automation system API",
     version="1.0.0",
     lifespan=lifespan,
-    docs_url="/docs" if Settings().debug else None,
-    redoc_url="/redoc" if Settings().debug else None,
-    openapi_url="/openapi.json" if Settings().debug else None,
+    docs_url="/docs" if _debug else None,
+    redoc_url="/redoc" if _debug else None,
+    openapi_url="/openapi.json" if _debug else None,
 )
 
-# Add middleware to inject API manager into request state
-@app.middleware("http")
-async def add_api_manager_middleware(request: Request, call_next):
-    request.state.api_manager = request.app.state.api_manager
-    response = await call_next(request)
-    return response
-
-# Add request processing time middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+class RequestPrepMiddleware:
+    """ASGI middleware that injects the API manager into request state and adds an X-Process-Time header.
+    
+    Both jobs share one layer so each request pays for a single extra call frame.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in FASTPATH_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        # request.state is backed by scope["state"]; the manager is created in lifespan
+        scope.setdefault("state", {})["api_manager"] = scope["app"].state.api_manager
+        start_time = time.perf_counter()
+        
+        async def send_wrapper(message: Message):
+            # Headers go out with the response start, so stamp the elapsed time there
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                MutableHeaders(scope=message)["X-Process-Time"] = str(process_time)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+# Inject the API manager into request state and time each request
+app.add_middleware(RequestPrepMiddleware)
 
 # Setup middleware
-settings = Settings()
-redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+# One Redis connection pool for the whole app; connections are opened lazily on first use.
+# When all are busy, callers wait up to pool_timeout instead of failing with "Too many connections".
+# redis-py picks the hiredis reply parser automatically when it is installed.
+redis_pool = redis.BlockingConnectionPool.from_url(
+    settings.redis_url,
+    max_connections=settings.redis.max_connections,
+    timeout=settings.redis.pool_timeout,
+    decode_responses=True,
+    socket_keepalive=True,
+    health_check_interval=30,
+)
+redis_client = redis.Redis(connection_pool=redis_pool)
 
 # Setup security middleware (CORS, rate limiting, API key auth)
 setup_security_middleware(app, settings, redis_client)
@@ -172,25 +210,54 @@ setup_error_handlers(app)
 # Include routers
 app.include_router(api_router.router)
 
+# Response bodies for the probe endpoints, serialized once; /health only fills in its timestamp
+_ROOT_BODY = orjson.dumps({
+    "message": "Welcome to ZealX API",
+    "version": "1.0.0",
+    "status": "online",
+    "docs": "/docs" if settings.debug else "Documentation disabled in production"
+})
+_HEALTH_PREFIX = b'{"status":"healthy","timestamp":'
+_HEALTH_SUFFIX = b',"environment":' + orjson.dumps("production" if not settings.debug else "development") + b'}'
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 async def root():
-    return {
-        "message": "Welcome to ZealX API",
-        "version": "1.0.0",
-        "status": "online",
-        "docs": "/docs" if settings.debug else "Documentation disabled in production"
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": time.time(),
-        "environment": "production" if not settings.debug else "development"
-    }
+    return Response(
+        content=_HEALTH_PREFIX + repr(time.time()).encode() + _HEALTH_SUFFIX,
+        media_type="application/json"
+    )
 
 if __name__ == "__main__":
+    import os
+    import sys
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    
+    # uvloop and httptools are faster than the asyncio loop and h11 but do not support Windows
+    fast_io = sys.platform != "win32"
+    server_options = {
+        "host": "0.0.0.0",
+        "port": 8000,
+        "loop": "uvloop" if fast_io else "asyncio",
+        "http": "httptools" if fast_io else "h11",
+    }
+    if settings.debug:
+        # Auto-reload needs a single process
+        uvicorn.run("backend.app:app", reload=True, **server_options)
+    else:
+        # Every worker is a separate process with its own ZealX instances and per-user locks, and
+        # secrets left to their defaults are generated per process, so a token issued by one worker
+        # would fail in the others. Only fan out once both secrets are configured.
+        from backend.core.config import SecuritySettings
+        
+        workers = 1
+        if {"secret_key", "api_key"} <= SecuritySettings().model_fields_set:
+            workers = os.cpu_count()
+        else:
+            logger.warning("Security secret_key and api_key are not configured; running a single worker")
+        uvicorn.run("backend.app:app", workers=workers, **server_options)
\ No newline at end of file
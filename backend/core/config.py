@@ -11,10 +11,21 @@ import os
 import secrets
 from typing import List, Dict, Optional, Any, Union
 from pydantic import Field, AnyHttpUrl,field_validator
-from pydantic_settings.main import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 import json
+from dataclasses import make_dataclass
 from functools import lru_cache
 
+# Shared by every settings model; .env is only consulted when it exists, and loaded settings are immutable.
+# Each model reads the same .env, so keys that belong to the other models are ignored.
+_MODEL_CONFIG = SettingsConfigDict(
+    env_file=".env" if os.path.exists(".env") else None,
+    env_file_encoding="utf-8",
+    case_sensitive=True,
+    extra="ignore",
+    frozen=True,
+)
+
 class CloudflareSettings(BaseSettings):
     """Cloudflare API settings."""
     api_keys: List[str] = Field(..., env="CLOUDFLARE_API_KEYS")
@@ -28,10 +39,7 @@ class CloudflareSettings(BaseSettings):
             return [item.strip() for item in v.split(",")]
         return v
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class DatabaseSettings(BaseSettings):
     """Database connection settings."""
@@ -53,10 +61,7 @@ class DatabaseSettings(BaseSettings):
         """Get asyncpg connection URI."""
         return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.db}"
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class RedisSettings(BaseSettings):
     """Redis connection settings."""
@@ -65,6 +70,8 @@ class RedisSettings(BaseSettings):
     password: Optional[str] = Field(None, env="REDIS_PASSWORD")
     db: int = Field(0, env="REDIS_DB")
     use_ssl: bool = Field(False, env="REDIS_USE_SSL")
+    max_connections: int = Field(50, env="REDIS_MAX_CONNECTIONS")  # per worker process
+    pool_timeout: float = Field(5.0, env="REDIS_POOL_TIMEOUT")  # seconds to wait for a free connection
     
     @property
     def url(self) -> str:
@@ -73,10 +80,7 @@ class RedisSettings(BaseSettings):
         auth = f":{self.password}@" if self.password else ""
         return f"{protocol}://{auth}{self.host}:{self.port}/{self.db}"
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class ADXSettings(BaseSettings):
     """Adaptive Execution Mode (ADX) settings."""
@@ -88,10 +92,7 @@ class ADXSettings(BaseSettings):
     memory_threshold: float = Field(80.0, env="ADX_MEMORY_THRESHOLD")  # percentage
     battery_threshold: float = Field(20.0, env="ADX_BATTERY_THRESHOLD")  # percentage
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class SecuritySettings(BaseSettings):
     """Security settings."""
@@ -118,10 +119,7 @@ class SecuritySettings(BaseSettings):
             return [item.strip() for item in v.split(",")]
         return v
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class APIAccountManagerSettings(BaseSettings):
     """API Account Manager settings."""
@@ -134,10 +132,7 @@ class APIAccountManagerSettings(BaseSettings):
     failover_enabled: bool = Field(True, env="API_FAILOVER_ENABLED")
     failover_threshold: int = Field(2, env="API_FAILOVER_THRESHOLD")  # consecutive failures
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class LoggingSettings(BaseSettings):
     """Logging settings."""
@@ -148,10 +143,7 @@ class LoggingSettings(BaseSettings):
     max_size: int = Field(10 * 1024 * 1024, env="LOG_MAX_SIZE")  # 10 MB
     backup_count: int = Field(5, env="LOG_BACKUP_COUNT")
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class CloudSettings(BaseSettings):
     """Cloud-specific settings."""
@@ -163,10 +155,7 @@ class CloudSettings(BaseSettings):
     min_instances: int = Field(1, env="CLOUD_MIN_INSTANCES")
     max_instances: int = Field(5, env="CLOUD_MAX_INSTANCES")
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
 
 class Settings(BaseSettings):
     """Main application settings."""
@@ -215,15 +204,38 @@ class Settings(BaseSettings):
             return os.getenv("AZURE_FILES_MOUNT_POINT", v)
         return v
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = True
+    model_config = _MODEL_CONFIG
+
+# Settings model class -> generated frozen dataclass mirroring it
+_FROZEN_CLASSES: Dict[type, type] = {}
+
+def _freeze(model: BaseSettings) -> Any:
+    """Snapshot a settings model as a frozen, slotted dataclass, recursing into nested settings.
+    
+    Fields become plain slots and the model's properties (e.g. redis_url) are
+    carried over, so reads skip pydantic's attribute machinery.
+    """
+    cls = type(model)
+    frozen_cls = _FROZEN_CLASSES.get(cls)
+    if frozen_cls is None:
+        properties = {name: attr for name, attr in vars(cls).items() if isinstance(attr, property)}
+        frozen_cls = make_dataclass(
+            f"{cls.__name__}Frozen", list(cls.model_fields),
+            namespace=properties, frozen=True, slots=True
+        )
+        frozen_cls.__doc__ = cls.__doc__
+        _FROZEN_CLASSES[cls] = frozen_cls
+    
+    values = {}
+    for name in cls.model_fields:
+        value = getattr(model, name)
+        values[name] = _freeze(value) if isinstance(value, BaseSettings) else value
+    return frozen_cls(**values)
 
 @lru_cache()
-def get_settings() -> Settings:
-    """Get cached settings instance."""
-    return Settings()
+def get_settings() -> Any:
+    """Get the cached, frozen snapshot of the settings."""
+    return _freeze(Settings())
 
 # Create settings instance
 settings = get_settings()
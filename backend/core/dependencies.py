@@ -2,9 +2,15 @@
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+import jwt
 from typing import Optional, Dict, Any
 import time
+import heapq
+import array
+import itertools
+import hashlib
+from collections import namedtuple, OrderedDict
 from datetime import datetime, timedelta
 
 from backend.core.config import settings
@@ -14,6 +20,16 @@ from storagex.storagex import StorageX
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/users/token")
 
+# JWT key material and decode options, resolved once instead of per request
+_JWT_SECRET = settings.security.secret_key.encode()
+_JWT_ALGORITHMS = (settings.security.algorithm,)
+_JWT_OPTIONS = {"require": ["exp", "sub"], "verify_aud": False, "verify_iss": False}
+
+# Authenticated users by token fingerprint, so repeat requests skip the decode and user lookup
+USER_CACHE_SIZE = 10_000  # Most tokens remembered
+USER_CACHE_TTL = 30  # Seconds a lookup is reused; never past the token's own expiry
+_user_cache = OrderedDict()  # fingerprint -> (valid_until, user), oldest first
+
 # User database - In production, replace with actual database
 # This is just a mock for demonstration
 fake_users_db = {
@@ -33,6 +49,9 @@ fake_users_db = {
     }
 }
 
+# Immutable account record handed out by APIAccountManager
+_Account = namedtuple("_Account", "index api_key account_id")
+
 # Account rotation state
 class APIAccountManager:
     """Manages Cloudflare API account rotation for multi-account handling."""
@@ -40,9 +59,19 @@ class APIAccountManager:
     def __init__(self):
         self.api_keys = settings.cloudflare.api_keys
         self.account_ids = settings.cloudflare.account_ids
-        self.current_index = 0
-        self.usage_counts = {i: 0 for i in range(len(self.api_keys))}
-        self.last_used = {i: 0 for i in range(len(self.api_keys))}
+        # Built once so selection returns a shared record instead of a new dict per call
+        self._records = tuple(
+            _Account(index=i, api_key=key, account_id=self.account_ids[i] if i < len(self.account_ids) else None)
+            for i, key in enumerate(self.api_keys)
+        )
+        self._rr = itertools.count()  # Round-robin ticket; next() is a single step under the GIL
+        # Per-account counters indexed by account position
+        self.usage_counts = array.array('Q', [0] * len(self.api_keys))
+        self.last_used = array.array('d', [0.0] * len(self.api_keys))
+        # Min-heap of (usage_count, last_used, index); entries that no longer match the
+        # counters are stale and skipped when popped
+        self._heap = [(0, 0.0, i) for i in range(len(self.api_keys))]
+        heapq.heapify(self._heap)
         self.rate_limit = settings.cloudflare.rate_limit_per_minute
         self.rotation_strategy = settings.cloudflare.rotation_strategy
     
@@ -64,31 +93,43 @@ class APIAccountManager:
             account = self._get_round_robin()
         
         # Update usage statistics
-        self.usage_counts[account["index"]] += 1
-        self.last_used[account["index"]] = time.time()
+        index = account.index
+        self.usage_counts[index] += 1
+        self.last_used[index] = time.time()
+        self._push(index)
         
         return account
     
+    def _push(self, index):
+        """Record an account's current counters in the heap, compacting it once stale entries pile up."""
+        if len(self._heap) >= 4 * len(self.api_keys):
+            self._heap = [(self.usage_counts[i], self.last_used[i], i) for i in range(len(self.api_keys))]
+            heapq.heapify(self._heap)
+        else:
+            heapq.heappush(self._heap, (self.usage_counts[index], self.last_used[index], index))
+    
+    def _pop_current(self):
+        """Pop the heap head that still matches the live counters."""
+        while True:
+            entry = heapq.heappop(self._heap)
+            usage, last_used, index = entry
+            if usage == self.usage_counts[index] and last_used == self.last_used[index]:
+                return entry
+    
     def _get_round_robin(self):
         """Simple round-robin rotation."""
-        index = self.current_index
-        self.current_index = (self.current_index + 1) % len(self.api_keys)
+        index = next(self._rr) % len(self.api_keys)
         
-        return {
-            "index": index,
-            "api_key": self.api_keys[index],
-            "account_id": self.account_ids[index] if index < len(self.account_ids) else None
-        }
+        return self._records[index]
     
     def _get_least_used(self):
         """Get the least used account."""
-        index = min(self.usage_counts, key=self.usage_counts.get)
+        # Peek at the live head; get_next_account() pushes the updated entry back
+        entry = self._pop_current()
+        heapq.heappush(self._heap, entry)
+        index = entry[2]
         
-        return {
-            "index": index,
-            "api_key": self.api_keys[index],
-            "account_id": self.account_ids[index] if index < len(self.account_ids) else None
-        }
+        return self._records[index]
     
     def _get_adaptive(self):
         """Adaptive rotation based on usage and time since last use."""
@@ -96,24 +137,25 @@ class APIAccountManager:
         current_time = time.time()
         cooldown_period = 60  # 1 minute cooldown
         
-        # Filter accounts that are not in cooldown
-        available_accounts = [
-            i for i in range(len(self.api_keys)) 
-            if (current_time - self.last_used[i]) > cooldown_period
-        ]
+        # Pop in usage order until an account outside its cooldown turns up
+        in_cooldown = []
+        index = None
+        while len(in_cooldown) < len(self.api_keys):
+            entry = self._pop_current()
+            in_cooldown.append(entry)
+            if (current_time - entry[1]) > cooldown_period:
+                # Use the least used account among available ones
+                index = entry[2]
+                break
         
-        if not available_accounts:
+        if index is None:
             # If all accounts are in cooldown, use least recently used
-            index = min(self.last_used, key=self.last_used.get)
-        else:
-            # Use the least used account among available ones
-            index = min(available_accounts, key=lambda i: self.usage_counts[i])
+            index = min(in_cooldown, key=lambda e: e[1])[2]
         
-        return {
-            "index": index,
-            "api_key": self.api_keys[index],
-            "account_id": self.account_ids[index] if index < len(self.account_ids) else None
-        }
+        for entry in in_cooldown:
+            heapq.heappush(self._heap, entry)
+        
+        return self._records[index]
 
 # Create global instances
 api_account_manager = APIAccountManager()
@@ -154,12 +196,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    encoded_jwt = jwt.encode(to_encode, _JWT_SECRET, algorithm=_JWT_ALGORITHMS[0])
     
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Get current user from JWT token."""
+    fingerprint = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.time()
+    cached = _user_cache.get(fingerprint)
+    if cached is not None:
+        if cached[0] > now:
+            _user_cache.move_to_end(fingerprint)
+            return cached[1]
+        del _user_cache[fingerprint]
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -167,17 +218,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = jwt.decode(token, _JWT_SECRET, algorithms=_JWT_ALGORITHMS, options=_JWT_OPTIONS)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
     
     user = get_user(username)
     if user is None:
         raise credentials_exception
     
+    _user_cache[fingerprint] = (min(now + USER_CACHE_TTL, payload["exp"]), user)
+    if len(_user_cache) > USER_CACHE_SIZE:
+        _user_cache.popitem(last=False)
+    
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -194,15 +249,26 @@ async def get_storage_manager():
     """Get StorageX instance."""
     return storage_instance
 
-def get_zealx_instance(request: Request, user: User = Depends(get_current_active_user)):
+def _start_zealx(user: User):
+    """Construct and start a ZealX instance; blocking, so it runs in the threadpool."""
+    # Import here to avoid circular imports
+    from zealx import ZealX
+    
+    zealx = ZealX(user_id=user.username, is_premium=user.is_premium)
+    zealx.start()
+    return zealx
+
+async def get_zealx_instance(request: Request, user: User = Depends(get_current_active_user)):
     """Get or create ZealX instance for user."""
-    if user.username not in request.app.state.zealx_instances:
-        # Import here to avoid circular imports
-        from zealx import ZealX
-        
-        # Create new ZealX instance for user
-        zealx = ZealX(user_id=user.username, is_premium=user.is_premium)
-        zealx.start()
-        request.app.state.zealx_instances[user.username] = zealx
+    instances = request.app.state.zealx_instances
+    zealx = instances.get(user.username)
+    if zealx is not None:
+        return zealx
+    
+    # Only one request per user creates the instance; others wait on the user's lock
+    async with request.app.state.zealx_locks[user.username]:
+        if user.username not in instances:
+            # Create new ZealX instance for user
+            instances[user.username] = await run_in_threadpool(_start_zealx, user)
     
-    return request.app.state.zealx_instances[user.username]
+    return instances[user.username]
@@ -19,7 +19,7 @@ import jwt
 from datetime import datetime, timedelta
 import secrets
 
-from backend.core.config import Settings
+from backend.core.config import Settings, get_settings
 
 # Configure logger
 logger = logging.getLogger("zealx.security")
@@ -27,6 +27,9 @@ logger = logging.getLogger("zealx.security")
 # Security token handling
 security = HTTPBearer()
 
+# Probe and metadata endpoints that need no per-request preparation, rate limiting or API key check
+FASTPATH_PATHS = frozenset({"/", "/health", "/api/health", "/openapi.json"})
+
 class RateLimiter:
     """
     Redis-based rate limiter for API endpoints
@@ -169,8 +172,9 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         self.rate_limiter = RateLimiter(redis_client, settings)
     
     async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for non-API endpoints
-        if not request.url.path.startswith("/api"):
+        # Skip rate limiting for non-API endpoints and health probes
+        path = request.url.path
+        if not path.startswith("/api") or path in FASTPATH_PATHS:
             return await call_next(request)
         
         # Get client identifier (IP address or user ID if authenticated)
@@ -274,7 +278,7 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         # Skip API key check for non-protected endpoints
         path = request.url.path
-        if not any(path.startswith(p) for p in self.protected_paths):
+        if path in FASTPATH_PATHS or not any(path.startswith(p) for p in self.protected_paths):
             return await call_next(request)
         
         # Check for API key in header
@@ -328,7 +332,7 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    settings: Settings = Depends(lambda: Settings())
+    settings: Settings = Depends(get_settings)
 ):
     """
     Validate JWT token and return user information
@@ -14,8 +14,6 @@ from datetime import datetime
 import logging
 import io
 import os
-import sys
-sys.path.append(os.path.abspath("/Users/momo/Desktop/x"))
 
 from pydantic import BaseModel
 
@@ -26,7 +24,7 @@ from backend.models.api import (
 )
 from backend.core.firelayers import fire_layers
 from backend.core.logging_manager import logging_manager
-from backend.core.config import Settings
+from backend.core.config import Settings, settings as app_settings
 from storagex.storage_manager import generate_file_content, get_adx_optimized_file_operations, get_client_storage_instructions
 from storagex.database import get_database_schema, generate_client_db_init_script, export_database_data
 from storagex.storagex import StorageX
@@ -42,7 +40,7 @@ router = APIRouter(prefix="/api", tags=["ZealX API"])
 
 # Dependency to get settings
 async def get_settings():
-    return Settings()
+    return app_settings
 
 # Dependency to get API manager from request state
 async def get_api_manager(request: Request):
@@ -40,8 +40,8 @@ class AutoXAIService:
         
         # Get API account
         account = self.api_account_manager.get_next_account()
-        api_key = account["api_key"]
-        account_id = account["account_id"]
+        api_key = account.api_key
+        account_id = account.account_id
         
         # Prepare request
         url = self.base_url.format(account_id=account_id, model=self.model)
@@ -132,7 +132,7 @@ Respond with a JSON object containing the task details.
                     "ai_engine": "AutoX",
                     "model": self.model,
                     "processing_time": f"{int(processing_time * 1000)}ms",
-                    "account_index": account["index"]
+                    "account_index": account.index
                 }
             }
         except requests.exceptions.RequestException as e:
@@ -141,7 +141,7 @@ Respond with a JSON object containing the task details.
             
             # Try with another account if possible
             if len(settings.cloudflare.api_keys) > 1:
-                print(f"Error with account {account['index']}, trying another account...")
+                print(f"Error with account {account.index}, trying another account...")
                 return await self.process_trigger(app_id, trigger_type, trigger_data)
             
             # Create error task
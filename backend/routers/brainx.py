@@ -43,8 +43,8 @@ class BrainXAI:
         
         # Get API account
         account = self.api_account_manager.get_next_account()
-        api_key = account["api_key"]
-        account_id = account["account_id"]
+        api_key = account.api_key
+        account_id = account.account_id
         
         # Prepare request
         url = self.base_url.format(account_id=account_id, model=self.model)
@@ -105,7 +105,7 @@ class BrainXAI:
                     "ai_engine": "BrainX",
                     "model": self.model,
                     "processing_time": f"{int(processing_time * 1000)}ms",
-                    "account_index": account["index"],
+                    "account_index": account.index,
                     "fire_layers": self.fire_layers_enabled
                 }
             }
@@ -115,7 +115,7 @@ class BrainXAI:
             
             # Try with another account if possible
             if len(settings.cloudflare.api_keys) > 1:
-                print(f"Error with account {account['index']}, trying another account...")
+                print(f"Error with account {account.index}, trying another account...")
                 return await self.generate_response(messages, temperature, max_tokens)
             
             return {
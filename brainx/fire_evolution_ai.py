@@ -233,10 +233,10 @@ class FireEvolutionAI(FireLayersX):
             best_account = None
             lowest_usage = float('inf')
             
-            for idx, status in statuses.items():
+            for idx, status in enumerate(statuses):
                 if self.ai_manager.is_account_available(idx):
                     # Calculate a usage score based on recent activity
-                    usage_score = status.get("total_requests", 0) * 0.7 + status.get("total_failures", 0) * 0.3
+                    usage_score = status.total_requests * 0.7 + status.total_failures * 0.3
                     
                     if usage_score < lowest_usage:
                         lowest_usage = usage_score
@@ -5,21 +5,54 @@ import os
 STORAGE_DIR = "storagex_data"
 FAISS_INDEX_PATH = os.path.join(STORAGE_DIR, "faiss.index")
 
+# Once the flat index holds more than FAISS_IVF_THRESHOLD vectors it is rebuilt as
+# FAISS_INDEX_SPEC: IVF limits each search to FAISS_NPROBE cells and PQ compresses vectors.
+# PQ32 splits each vector into 32 sub-vectors, so other dimensions use FAISS_FALLBACK_SPEC.
+FAISS_INDEX_SPEC = "IVF256,PQ32"
+FAISS_PQ_SUBVECTORS = 32
+FAISS_FALLBACK_SPEC = "IVF256,Flat"
+FAISS_IVF_THRESHOLD = 10000
+FAISS_NPROBE = 8
+FAISS_TRAIN_SAMPLE = 50000  # Most vectors used to train the new index
+
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
 def init_faiss(dim=512):
     """Initialize or load FAISS index (disk-based)."""
     if os.path.exists(FAISS_INDEX_PATH):
         index = faiss.read_index(FAISS_INDEX_PATH)
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = FAISS_NPROBE
     else:
         index = faiss.IndexFlatL2(dim)
         faiss.write_index(index, FAISS_INDEX_PATH)
     return index
 
+def _upgrade_index(index, index_spec=None):
+    """Rebuild a large flat index as a trained IVF/PQ index, keeping vector order (and so IDs)."""
+    if index_spec is None:
+        index_spec = FAISS_INDEX_SPEC if index.d % FAISS_PQ_SUBVECTORS == 0 else FAISS_FALLBACK_SPEC
+    vectors = index.reconstruct_n(0, index.ntotal)
+    sample = vectors
+    if len(vectors) > FAISS_TRAIN_SAMPLE:
+        sample = vectors[np.random.default_rng().choice(len(vectors), FAISS_TRAIN_SAMPLE, replace=False)]
+
+    new_index = faiss.index_factory(index.d, index_spec, faiss.METRIC_L2)
+    new_index.train(sample)
+    new_index.add(vectors)
+    new_index.nprobe = FAISS_NPROBE
+    return new_index
+
 def add_faiss_embedding(vector):
     """Add a new vector to FAISS index."""
     index = init_faiss(len(vector))
     index.add(np.array([vector]).astype('float32'))
+    if isinstance(index, faiss.IndexFlat) and index.ntotal > FAISS_IVF_THRESHOLD:
+        try:
+            index = _upgrade_index(index)
+        except Exception as e:
+            # Keep the flat index, with the new vector, rather than lose the write
+            print(f"Failed to rebuild FAISS index: {e}")
     faiss.write_index(index, FAISS_INDEX_PATH)
 
 def search_faiss_embedding(query_vector, top_k=3):
@@ -89,7 +89,7 @@ class StorageX:
         
         Args:
             text (str): Text to store
-            embedding (list, optional): Vector embedding for the text
+            embedding (list or np.ndarray, optional): Vector embedding for the text
             
         Returns:
             dict: Memory data for client-side storage
@@ -97,6 +97,9 @@ class StorageX:
         # Generate a random embedding if none provided
         if embedding is None:
             embedding = np.random.rand(MAX_VECTOR_DIMENSION).astype('float32').tolist()
+        elif isinstance(embedding, np.ndarray):
+            # Arrays are converted once here, where the memory is serialized for the client
+            embedding = embedding.tolist()
         
         # Update statistics
         self.stats["total_memories"] += 1
@@ -120,6 +123,45 @@ class StorageX:
         
         return generate_file_content(f"memory_{self.stats['total_memories']}.json", result)
     
+    def store_memories_with_embeddings(self, texts, embeddings):
+        """
+        Generate data for several memories at once for client-side storage.
+        
+        Args:
+            texts (list): Texts to store
+            embeddings (np.ndarray or list): One vector embedding per text
+            
+        Returns:
+            dict: Memory batch data for client-side storage
+        """
+        # Convert the whole batch in one call rather than per vector
+        if isinstance(embeddings, np.ndarray):
+            embeddings = embeddings.tolist()
+        
+        first_id = self.stats["total_memories"] + 1
+        timestamp = datetime.now().isoformat()
+        memories = []
+        for text, embedding in zip(texts, embeddings):
+            self.stats["total_memories"] += 1
+            memories.append({
+                "text": text,
+                "embedding": embedding,
+                "timestamp": timestamp,
+                "id": self.stats["total_memories"],
+                "adx_mode": self.stats["adx_mode"]
+            })
+        
+        # Statistics are generated once for the whole batch
+        stats_file = self.get_stats()
+        
+        result = {
+            "memories": memories,
+            "stats": stats_file["content"],
+            "adx_settings": ADX_MODES[self.stats["adx_mode"]]
+        }
+        
+        return generate_file_content(f"memories_{first_id}-{self.stats['total_memories']}.json", result)
+    
     def search_similar_memories_instructions(self, query_embedding, top_k=5):
         """
         Generate instructions for client to search similar memories.